@@ -0,0 +1,99 @@
+"""Benchmarks of stepping the catchmod parameters with synthetic weather."""
+import atexit
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+from pywr.core import Model
+from pywr_extras import timing
+from pywr_extras.hydrology import CatchmodParameter, OudinCatchmodParameter, catchmod_factory
+from .common import load_model
+
+# (weather members, climate change members)
+SIZES = [(10, 1), (100, 10), (1000, 10)]
+DAYS = 365
+
+
+def catchment_data(oudin=False, number_of_subcatchments=3):
+    subcatchments = []
+    for i in range(number_of_subcatchments):
+        subcatchments.append({
+            'name': 'subcatchment{}'.format(i),
+            'area': 100.0 * (i + 1),
+            'initial_upper_deficit': 0.0,
+            'initial_lower_deficit': 0.0,
+            'initial_linear_outflow': 0.0,
+            'initial_nonlinear_outflow': 0.0,
+            'direct_percolation': 50.0,
+            'potential_drying_constant': 100.0,
+            'gradient_drying_curve': 0.3,
+            'linear_storage_constant': 0.8,
+            'nonlinear_storage_constant': 5.0,
+        })
+    data = {'name': 'benchmark', 'subcatchments': subcatchments}
+    if oudin:
+        data['class'] = 'OudinCatchment'
+        data['latitude'] = 51.0
+    return data
+
+
+def weather(days, members, seed=0):
+    """Return synthetic daily rainfall, PET and temperature of shape (days, members)."""
+    rs = np.random.RandomState(seed)
+    doy = np.arange(days)[:, np.newaxis]
+    seasonal = np.sin(2 * np.pi * doy / 365.25)
+    rainfall = rs.gamma(0.6, 4.0, size=(days, members))
+    pet = np.maximum(2.0 + 1.5 * seasonal + 0.3 * rs.standard_normal((days, members)), 0.0)
+    temperature = 10.0 + 6.0 * seasonal + 2.0 * rs.standard_normal((days, members))
+    return rainfall, pet, temperature
+
+
+def factors(members, seed=1):
+    """Return synthetic monthly climate change factors of shape (12, members)."""
+    rs = np.random.RandomState(seed)
+    return 1.0 + 0.1 * rs.standard_normal((12, members))
+
+
+def _setup(directory, oudin, nweather, ncc, num_threads):
+    filename = os.path.join(directory, 'catchment_{}.json'.format('oudin' if oudin else 'catchmod'))
+    with open(filename, mode='w') as fh:
+        json.dump(catchment_data(oudin=oudin), fh)
+
+    model, (weather_scenario, cc_scenario) = load_model(Model, [nweather, ncc], days=DAYS)
+    rainfall, pet, temperature = weather(DAYS, nweather)
+    if oudin:
+        klass = OudinCatchmodParameter
+        p = klass(None, weather_scenario, cc_scenario, rainfall, temperature, factors(ncc), factors(ncc, seed=2),
+                  catchmod_factory=catchmod_factory(filename), num_threads=num_threads)
+    else:
+        klass = CatchmodParameter
+        p = klass(None, weather_scenario, cc_scenario, rainfall, pet, factors(ncc), factors(ncc, seed=2),
+                  catchmod_factory=catchmod_factory(filename), num_threads=num_threads)
+    model.nodes['supply'].max_flow = p
+    model.setup()
+
+    phase = '{}.before'.format(klass.__name__)
+
+    def func():
+        timing.enable()
+        try:
+            timing.stats.reset()
+            model.run()
+            return {'before': timing.stats.total(phase), 'steps': timing.stats.count(phase)}
+        finally:
+            timing.disable()
+    return func
+
+
+def benchmarks(quick):
+    sizes = SIZES[:1] if quick else SIZES
+    directory = tempfile.mkdtemp(prefix='pywr_extras_bench_')
+    atexit.register(shutil.rmtree, directory, ignore_errors=True)
+
+    for oudin in (False, True):
+        name = 'hydrology.{}'.format('OudinCatchmodParameter' if oudin else 'CatchmodParameter')
+        for nweather, ncc in sizes:
+            for num_threads in (1, 4):
+                params = {'weather': nweather, 'climate_change': ncc, 'days': DAYS, 'num_threads': num_threads}
+                yield name, params, lambda o=oudin, w=nweather, c=ncc, t=num_threads: _setup(directory, o, w, c, t)
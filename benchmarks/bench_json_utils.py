@@ -0,0 +1,82 @@
+"""Benchmarks of model assembly with `pywr_extras.json_utils` on generated documents."""
+import atexit
+import copy
+import json
+import os
+import shutil
+import tempfile
+from pywr_extras.json_utils import join_models, fix_external_urls, find_external_references, share_tables
+
+SIZES = [1000, 10000, 100000]
+NODES_PER_INCLUDE = 1000
+
+
+def generate_include(index, number_of_nodes):
+    """Return a sub-model of a chain of nodes with a parameter read from a shared file."""
+    names = ['node{}_{}'.format(index, i) for i in range(number_of_nodes)]
+    nodes = [{'name': name, 'type': 'link', 'max_flow': 'demand{}'.format(index)} for name in names]
+    edges = [[a, b] for a, b in zip(names[:-1], names[1:])]
+    parameters = {
+        'demand{}'.format(index): {
+            'type': 'indexedarray',
+            'index_parameter': 'level',
+            'params': [
+                {'type': 'monthlyprofile', 'url': 'C:\\data\\profiles.csv', 'index_col': 0, 'column': str(i)}
+                for i in range(4)
+            ]
+        },
+        'flow{}'.format(index): {'type': 'dataframe', 'url': '/data/flows.h5', 'key': 'flows', 'column': str(index)},
+    }
+    return {'nodes': nodes, 'edges': edges, 'parameters': parameters}
+
+
+def _write_includes(directory, number_of_nodes):
+    filenames = []
+    for i in range(max(1, number_of_nodes // NODES_PER_INCLUDE)):
+        filename = os.path.join(directory, 'include{}.json'.format(i))
+        with open(filename, mode='w') as fh:
+            json.dump(generate_include(i, min(number_of_nodes, NODES_PER_INCLUDE)), fh)
+        filenames.append(filename)
+    return filenames
+
+
+def _directory(root, name):
+    path = os.path.join(root, str(name))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def benchmarks(quick):
+    sizes = SIZES[:1] if quick else SIZES
+    directory = tempfile.mkdtemp(prefix='pywr_extras_bench_')
+    atexit.register(shutil.rmtree, directory, ignore_errors=True)
+
+    for size in sizes:
+        def setup(size=size):
+            filenames = _write_includes(_directory(directory, size), size)
+            return lambda: join_models(filenames)
+        yield 'json_utils.join_models', {'nodes': size}, setup
+
+        def setup(size=size):
+            path = _directory(directory, 'cached{}'.format(size))
+            filenames = _write_includes(path, size)
+            cache_dir = os.path.join(path, 'cache')
+            # Populate the parse cache so that the cached loads are timed
+            join_models(filenames, cache_dir=cache_dir)
+            return lambda: join_models(filenames, cache_dir=cache_dir)
+        yield 'json_utils.join_models_cached', {'nodes': size}, setup
+
+        def setup(size=size):
+            data = join_models(_write_includes(_directory(directory, size), size))
+            return lambda: copy.deepcopy(data), lambda d: {'filenames': len(fix_external_urls(d))}
+        yield 'json_utils.fix_external_urls', {'nodes': size}, setup
+
+        def setup(size=size):
+            data = join_models(_write_includes(_directory(directory, size), size))
+            return lambda: {'references': len(find_external_references(data))}
+        yield 'json_utils.find_external_references', {'nodes': size}, setup
+
+        def setup(size=size):
+            data = join_models(_write_includes(_directory(directory, size), size))
+            return lambda: copy.deepcopy(data), lambda d: {'tables': len(share_tables(d))}
+        yield 'json_utils.share_tables', {'nodes': size}, setup
@@ -0,0 +1,74 @@
+"""Benchmarks of the binned optimisation model and its operators."""
+import contextlib
+import io
+import random
+import inspyred
+from pywr.recorders import TotalDeficitNodeRecorder
+from pywr_extras.optimisation import (InspyredBinnedOptimisationModel, bin_crossover, bin_mutation,
+                                      binned_variable_blend_crossover, binned_variable_gaussian_mutation)
+from pywr_extras.parameters import ConstantScaledParameter
+from pywr_extras._optimisation import BinnedScenarioParameter, BinnedParameter
+from .common import load_model
+
+# (binned scenario members, bins)
+SIZES = [(10, 2), (100, 5), (1000, 10)]
+POPULATION_SIZE = 20
+DAYS = 365
+
+VARIATORS = [bin_crossover, bin_mutation, binned_variable_blend_crossover, binned_variable_gaussian_mutation]
+
+
+def binned_model(members, bins):
+    model, (scenario, ) = load_model(InspyredBinnedOptimisationModel, [members], days=DAYS)
+    binned_scenario_parameter = BinnedScenarioParameter(scenario, number_of_bins=bins, is_variable=True,
+                                                        name='bins')
+    demands = [ConstantScaledParameter(5.0, lower_bounds=0.0, upper_bounds=10.0, name='demand{}'.format(i))
+               for i in range(bins)]
+    demand = BinnedParameter(binned_scenario_parameter, demands, is_variable=True, name='demand')
+    model.nodes['demand'].max_flow = demand
+    TotalDeficitNodeRecorder(model, model.nodes['demand'], is_objective=True, name='deficit')
+    model.setup()
+    return model
+
+
+def _generation(members, bins, array_candidates):
+    model = binned_model(members, bins)
+
+    def func():
+        ea = inspyred.ec.emo.NSGA2(random.Random(0))
+        ea.variator = VARIATORS
+        ea.terminator = inspyred.ec.terminators.generation_termination
+        # The evaluator prints every fitness
+        with contextlib.redirect_stdout(io.StringIO()):
+            ea.evolve(generator=model.generator, evaluator=model.evaluator, pop_size=POPULATION_SIZE,
+                      maximize=False, bounder=model.bounder, max_generations=1, array_candidates=array_candidates)
+        return {'evaluations': ea.num_evaluations}
+    return func
+
+
+def _operators(members, bins, array_candidates):
+    model = binned_model(members, bins)
+    rng = random.Random(0)
+    ea = inspyred.ec.emo.NSGA2(rng)
+    ea.bounder = model.bounder
+    args = {'_ec': ea, 'array_candidates': array_candidates}
+    population = [model.generator(rng, args) for i in range(POPULATION_SIZE)]
+
+    def func():
+        candidates = list(population)
+        for op in VARIATORS:
+            candidates = op(random=rng, candidates=candidates, args=args)
+        return None
+    return func
+
+
+def benchmarks(quick):
+    sizes = SIZES[:1] if quick else SIZES
+    for members, bins in sizes:
+        for array_candidates in (False, True):
+            params = {'members': members, 'bins': bins, 'population': POPULATION_SIZE,
+                      'array_candidates': array_candidates}
+            yield ('optimisation.operators', params,
+                   lambda m=members, b=bins, a=array_candidates: _operators(m, b, a))
+            yield ('optimisation.generation', dict(params, days=DAYS),
+                   lambda m=members, b=bins, a=array_candidates: _generation(m, b, a))
@@ -0,0 +1,46 @@
+"""Benchmarks of the output of `BinnedRecorder` and the meta recorders."""
+import numpy as np
+from pywr.core import Model
+from pywr.recorders import TotalFlowNodeRecorder
+from pywr_extras.recorders import MetaRecorder, ColumnarMetaRecorder, BinnedRecorder
+from pywr_extras._optimisation import BinnedScenarioParameter
+from .common import load_model
+
+# (scenario members, recorders)
+SIZES = [(10, 10), (1000, 100), (10000, 100)]
+BINS = 10
+DAYS = 30
+
+
+def _run_model(members, number_of_recorders):
+    model, (scenario, ) = load_model(Model, [members], days=DAYS)
+    recorders = [TotalFlowNodeRecorder(model, model.nodes['demand'], name='flow{}'.format(i))
+                 for i in range(number_of_recorders)]
+    return model, scenario, recorders
+
+
+def _meta(klass, members, number_of_recorders):
+    model, scenario, recorders = _run_model(members, number_of_recorders)
+    meta = klass(model, recorders=recorders)
+    model.run()
+    return lambda: {'recorders': len(meta.value())}
+
+
+def _binned(members, number_of_recorders):
+    model, scenario, recorders = _run_model(members, number_of_recorders)
+    binned_scenario_parameter = BinnedScenarioParameter(scenario, number_of_bins=BINS, name='bins')
+    binned = BinnedRecorder(model, binned_scenario_parameter, recorders[:BINS], name='binned')
+    model.run()
+    binned_scenario_parameter.update_indices(np.arange(members, dtype=np.int32) % BINS)
+    return lambda: {'value': binned.aggregated_value()}
+
+
+def benchmarks(quick):
+    sizes = SIZES[:1] if quick else SIZES
+    for members, number_of_recorders in sizes:
+        params = {'members': members, 'recorders': number_of_recorders, 'days': DAYS}
+        yield 'recorders.MetaRecorder', params, lambda m=members, n=number_of_recorders: _meta(MetaRecorder, m, n)
+        yield ('recorders.ColumnarMetaRecorder', params,
+               lambda m=members, n=number_of_recorders: _meta(ColumnarMetaRecorder, m, n))
+        yield ('recorders.BinnedRecorder', dict(params, bins=BINS),
+               lambda m=members, n=number_of_recorders: _binned(m, n))
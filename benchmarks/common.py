@@ -0,0 +1,31 @@
+"""Synthetic pywr models shared by the benchmarks."""
+import numpy as np
+from pywr.core import Scenario
+
+START = '2000-01-01'
+
+
+def model_data(days=365, timestep=1):
+    """Return the JSON data of a model with a single supply to a demand."""
+    end = np.datetime64(START) + np.timedelta64(days - 1, 'D')
+    return {
+        'metadata': {'title': 'Benchmark', 'description': 'Synthetic benchmark model', 'minimum_version': '0.2dev0'},
+        'timestepper': {'start': START, 'end': str(end), 'timestep': timestep},
+        'nodes': [
+            {'name': 'supply', 'type': 'input', 'max_flow': 10.0},
+            {'name': 'demand', 'type': 'output', 'max_flow': 8.0, 'cost': -10.0},
+        ],
+        'edges': [['supply', 'demand']],
+        'parameters': {},
+        'recorders': {},
+    }
+
+
+def load_model(model_class, scenario_sizes, days=365, timestep=1):
+    """Load the benchmark model and add scenarios of the given sizes.
+
+    Returns the model and a list of its scenarios.
+    """
+    model = model_class.load(model_data(days=days, timestep=timestep))
+    scenarios = [Scenario(model, 'scenario{}'.format(i), size=size) for i, size in enumerate(scenario_sizes)]
+    return model, scenarios
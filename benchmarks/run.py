@@ -0,0 +1,115 @@
+"""Run the benchmarks and write the results as JSON.
+
+The benchmarks use synthetic inputs only. Run from the root of the repository with:
+
+    python -m benchmarks.run --output results.json
+
+Each benchmark module defines `benchmarks(quick)`, which yields tuples of (name, params, setup).
+`setup()` is not timed and returns the function that is timed. That function may return a dict
+of extra measurements (e.g. from `pywr_extras.timing`) that are stored with the result. If
+`setup()` returns a tuple of (before, func) then `before()` is called untimed before each repeat
+and its result passed to `func`; this is used by benchmarks that modify their input.
+"""
+import argparse
+import importlib
+import json
+import platform
+import subprocess
+import sys
+import time
+
+MODULES = [
+    'benchmarks.bench_hydrology',
+    'benchmarks.bench_optimisation',
+    'benchmarks.bench_recorders',
+    'benchmarks.bench_json_utils',
+]
+
+
+def _version(module_name):
+    try:
+        module = importlib.import_module(module_name)
+    except ImportError:
+        return None
+    return getattr(module, '__version__', 'unknown')
+
+
+def _commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def time_function(func, repeat, before=None):
+    times = []
+    extra = None
+    for i in range(repeat):
+        if before is None:
+            t0 = time.perf_counter()
+            extra = func()
+        else:
+            arg = before()
+            t0 = time.perf_counter()
+            extra = func(arg)
+        times.append(time.perf_counter() - t0)
+    return times, extra
+
+
+def run(modules, repeat=5, quick=False, filter=None):
+    results = []
+    for module_name in modules:
+        try:
+            module = importlib.import_module(module_name)
+        except ImportError as err:
+            # e.g. pywr or pycatchmod are not installed
+            results.append({'module': module_name, 'skipped': str(err)})
+            print('{}: skipped ({})'.format(module_name, err))
+            continue
+
+        for name, params, setup in module.benchmarks(quick):
+            if filter is not None and filter not in name:
+                continue
+            func = setup()
+            before = None
+            if isinstance(func, tuple):
+                before, func = func
+            times, extra = time_function(func, repeat, before=before)
+            result = {
+                'module': module_name,
+                'name': name,
+                'params': params,
+                'times': times,
+                'min': min(times),
+                'mean': sum(times) / len(times),
+            }
+            if extra:
+                result['extra'] = extra
+            results.append(result)
+            print('{} {}: {:.6f}s (min of {})'.format(name, json.dumps(params, sort_keys=True), min(times), repeat))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', default='benchmark_results.json', help='Filename of the JSON results.')
+    parser.add_argument('--repeat', type=int, default=5, help='Number of times to run each benchmark.')
+    parser.add_argument('--quick', action='store_true', help='Only run the smallest size of each benchmark.')
+    parser.add_argument('--filter', default=None, help='Only run benchmarks whose name contains this.')
+    args = parser.parse_args(argv)
+
+    data = {
+        'commit': _commit(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version,
+        'platform': platform.platform(),
+        'versions': {name: _version(name) for name in ('numpy', 'pywr', 'pycatchmod', 'inspyred')},
+        'repeat': args.repeat,
+        'results': run(MODULES, repeat=args.repeat, quick=args.quick, filter=args.filter),
+    }
+    with open(args.output, mode='w') as fh:
+        json.dump(data, fh, sort_keys=True, indent=4, separators=(',', ': '))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,17 +1,320 @@
 from pywr._core cimport Timestep, ScenarioIndex, Scenario
 from pywr.parameters._parameters cimport Parameter
 from pycatchmod._catchmod cimport Catchment, OudinCatchment
+from cython.parallel cimport prange
+from cython cimport floating
+from time import perf_counter
+import hashlib
+import multiprocessing
+import os
 import numpy as np
 cimport numpy as np
+from pywr_extras import timing
 
-cdef outer(double[:] a, double[:] b, double[:] c):
-    cdef int i, j, m, n
-    m = a.shape[0]
-    n = b.shape[0]
+cdef void perturb(floating[:] a, double[:] a_factors, floating[:] b, double[:] b_factors, int[:] weather_members,
+                  int[:] cc_members, double[:] a_perturbed, double[:] b_perturbed, int num_threads) nogil:
+    # Compute the products of two inputs with their climate change factors for each scenario combination
+    # in a single pass. The inputs may be single or double precision; the products are double precision.
+    cdef int k
 
-    for i in range(m):
-        for j in range(n):
-            c[i*n+j] = a[i]*b[j]
+    for k in prange(weather_members.shape[0], num_threads=num_threads, schedule='static'):
+        a_perturbed[k] = a[weather_members[k]]*a_factors[cc_members[k]]
+        b_perturbed[k] = b[weather_members[k]]*b_factors[cc_members[k]]
+
+
+cdef inline double column_sum(double[:, :] a, int j) nogil:
+    cdef int k
+    cdef double total = 0.0
+    for k in range(a.shape[0]):
+        total += a[k, j]
+    return total
+
+
+cdef void accumulate_outflow(double[:, :] outflow, double[:] total_outflow, double divisor, int num_threads) nogil:
+    # Add the total flow across all subcatchments, divided by divisor, to total_outflow
+    cdef int j
+    for j in prange(total_outflow.shape[0], num_threads=num_threads, schedule='static'):
+        total_outflow[j] += column_sum(outflow, j)/divisor
+
+
+cdef class InputWindow:
+    """ A window of days from a 2-D array of daily inputs with one column per scenario member.
+
+    The source can be any object with a `shape` that returns an array when sliced by rows, such as
+    a NumPy array, a memory-mapped `.npy` file (`numpy.load(..., mmap_mode='r')`) or an h5py dataset.
+    Rows are read lazily in chunks of `chunk_size` days starting at the requested day, so only one
+    chunk of the record is held in memory. In-memory arrays of the window's precision are used
+    directly.
+
+    If `single_precision` is true the window is stored as float32 and rows are read with `row32`.
+    This halves the memory and bandwidth of the inputs at the cost of rounding them to about seven
+    significant digits. In-memory arrays are converted to float32 once, and the window keeps only
+    the converted array as its `source`, so the double precision array can be freed. A double
+    precision window made from that source therefore has the rounded values.
+
+    The source must not be modified after the window is created.
+
+    """
+    cdef readonly object source
+    cdef readonly int chunk_size
+    cdef readonly int length
+    cdef readonly int width
+    cdef readonly bint single_precision
+    cdef int _start
+    cdef int _stop
+    cdef double[:, :] _window
+    cdef float[:, :] _window32
+    cdef object _token
+
+    def __init__(self, source, chunk_size=365, single_precision=False):
+        if chunk_size < 1:
+            raise ValueError("The chunk size must be at least one day.")
+        if single_precision and type(source) is np.ndarray:
+            source = np.ascontiguousarray(source, dtype=np.float32)
+        self.source = source
+        self.chunk_size = chunk_size
+        self.single_precision = single_precision
+        self.length, self.width = source.shape
+        self._token = None
+
+        dtype = np.float32 if single_precision else np.float64
+        self._window = None
+        self._window32 = None
+        if type(source) is np.ndarray and source.dtype == dtype:
+            if single_precision:
+                self._window32 = source
+            else:
+                self._window = source
+            self._start, self._stop = 0, self.length
+        else:
+            self._start, self._stop = 0, 0
+
+    property shape:
+        def __get__(self):
+            return self.length, self.width
+
+    cdef double[:] row(self, int index):
+        if index < self._start or index >= self._stop:
+            self._read(index)
+        return self._window[index - self._start, :]
+
+    cdef float[:] row32(self, int index):
+        if index < self._start or index >= self._stop:
+            self._read(index)
+        return self._window32[index - self._start, :]
+
+    cdef _read(self, int index):
+        cdef int stop = min(index + self.chunk_size, self.length)
+        if index < 0 or index >= self.length:
+            raise IndexError("Day {} is outside the input record of {} days.".format(index, self.length))
+        if self.single_precision:
+            self._window32 = np.ascontiguousarray(self.source[index:stop], dtype=np.float32)
+        else:
+            self._window = np.ascontiguousarray(self.source[index:stop], dtype=np.float64)
+        self._start, self._stop = index, stop
+
+    def token(self):
+        """Return a string identifying the contents of the source.
+
+        Files are identified by their name, modification time and the position, shape and strides
+        of the data in the file rather than by reading their contents. The token is computed once.
+        """
+        if self._token is None:
+            self._token = _source_token(self.source)
+        return self._token
+
+
+def _source_token(source):
+    filename = getattr(source, 'filename', None)
+    if filename is None:
+        # h5py datasets
+        filename = getattr(getattr(source, 'file', None), 'filename', None)
+
+    if filename is None:
+        a = np.ascontiguousarray(source)
+        return '{}:{}:{}'.format(a.dtype.str, a.shape, hashlib.sha1(a.data).hexdigest())
+
+    # Views of a memmap keep the filename and offset of the whole file, so their position within it
+    # is identified by their offset from the memmap of the whole file.
+    view_offset = 0
+    if isinstance(source, np.ndarray):
+        root = source
+        while isinstance(root.base, np.ndarray):
+            root = root.base
+        view_offset = source.__array_interface__['data'][0] - root.__array_interface__['data'][0]
+
+    return '{}:{}:{}:{}:{}:{}:{}:{}'.format(filename, getattr(source, 'name', ''), getattr(source, 'offset', 0),
+                                            view_offset, source.shape, getattr(source, 'strides', None),
+                                            getattr(source, 'dtype', None), os.path.getmtime(filename))
+
+
+def flow_cache_key(model, arrays, **kwargs):
+    """Return a key identifying a catchmod simulation of the model.
+
+    The key includes the contents of the input arrays (or `InputWindow`), the model's timestepper
+    and any additional keyword arguments (e.g. the `catchmod_token` of the catchmod model).
+    """
+    h = hashlib.sha1()
+    ts = model.timestepper
+    h.update(repr((str(ts.start), str(ts.end), str(ts.delta))).encode())
+    for a in arrays:
+        if isinstance(a, InputWindow):
+            h.update(a.token().encode())
+            continue
+        a = np.ascontiguousarray(a)
+        h.update(repr((a.dtype.str, a.shape)).encode())
+        h.update(a.data)
+    for k in sorted(kwargs):
+        h.update(repr((k, kwargs[k])).encode())
+    return h.hexdigest()
+
+
+# The parameters of each part of a catchmod model that determine its flows.
+CATCHMOD_PARAMETERS = {
+    'subcatchment': ('area',),
+    'soil_store': ('direct_percolation', 'potential_drying_constant', 'gradient_drying_curve',
+                   'initial_upper_deficit', 'initial_lower_deficit'),
+    'linear_store': ('linear_storage_constant', 'initial_outflow'),
+    'nonlinear_store': ('nonlinear_storage_constant', 'initial_outflow'),
+}
+
+
+def catchmod_token(catchmod):
+    """Return a string identifying the parameters and initial state of a catchmod model."""
+    h = hashlib.sha1()
+    h.update(repr((catchmod.__class__.__name__, catchmod.size, getattr(catchmod, 'latitude', None))).encode())
+    for subcatchment in catchmod.subcatchments:
+        for part, names in CATCHMOD_PARAMETERS.items():
+            obj = subcatchment if part == 'subcatchment' else getattr(subcatchment, part)
+            if obj is None:
+                h.update(repr((part, None)).encode())
+                continue
+            for name in names:
+                value = getattr(obj, name, None)
+                if value is None or np.isscalar(value):
+                    h.update(repr((part, name, value)).encode())
+                else:
+                    h.update(repr((part, name)).encode())
+                    h.update(np.ascontiguousarray(value, dtype=np.float64).data)
+    return h.hexdigest()
+
+
+def _flow_cache_filename(filename):
+    # Each worker process of a pool has its own file so they do not overwrite each other's flows.
+    process = multiprocessing.current_process()
+    if process.name == 'MainProcess':
+        return filename
+    root, ext = os.path.splitext(filename)
+    return '{}.{}{}'.format(root, process.pid, ext)
+
+
+def _allocate_flow_cache(ndays, timestep, size, filename=None):
+    # One row for every timestep that can be simulated from ndays of input.
+    shp = ((ndays + timestep - 1) // timestep, size)
+    if filename is not None:
+        return np.lib.format.open_memmap(_flow_cache_filename(filename), mode='w+', dtype=np.float64, shape=shp)
+    return np.empty(shp)
+
+
+def active_combinations(model, scenario, climate_change_scenario):
+    """Return the (weather, climate change) member pairs used by the model's scenario combinations.
+
+    The pairs are returned as a 2-D array in the order of weather member then climate change member.
+    """
+    i = model.scenarios.get_scenario_index(scenario)
+    j = model.scenarios.get_scenario_index(climate_change_scenario)
+    pairs = sorted(set((c.indices[i], c.indices[j]) for c in model.scenarios.combinations))
+    return np.array(pairs, dtype=np.int32).reshape(-1, 2)
+
+
+def _cached_pairs(pairs, weather_members, cc_members):
+    # Keep simulating the combinations of an existing flow cache if they include those now used, so
+    # that a model run on a subset of its combinations reuses the cache rather than replacing it.
+    cached = np.stack([np.asarray(weather_members), np.asarray(cc_members)], axis=1)
+    cached_set = set(map(tuple, cached.tolist()))
+    if all(pair in cached_set for pair in map(tuple, pairs.tolist())):
+        return cached
+    return pairs
+
+
+def _as_input_window(source, chunk_size, single_precision=False):
+    if isinstance(source, InputWindow):
+        if source.single_precision == single_precision:
+            return source
+        chunk_size = source.chunk_size
+        source = source.source
+    return InputWindow(source, chunk_size=chunk_size, single_precision=single_precision)
+
+
+STATE_VARIABLES = ('upper_deficit', 'lower_deficit', 'linear_outflow', 'nonlinear_outflow')
+
+
+def _stores(subcatchment):
+    # The store and attribute holding each state variable of a subcatchment (None if it has no such store)
+    return (
+        (subcatchment.soil_store, 'upper_deficit'),
+        (subcatchment.soil_store, 'lower_deficit'),
+        (subcatchment.linear_store, 'previous_outflow'),
+        (subcatchment.nonlinear_store, 'previous_outflow'),
+    )
+
+
+def catchmod_state(catchmod):
+    """Return the current state of a catchmod model.
+
+    Returns a dict of arrays of shape (subcatchments, size) for each of `STATE_VARIABLES`. The values
+    of stores that a subcatchment does not have are NaN.
+    """
+    nsubs = len(catchmod.subcatchments)
+    state = {name: np.full((nsubs, catchmod.size), np.nan) for name in STATE_VARIABLES}
+    for i, subcatchment in enumerate(catchmod.subcatchments):
+        for name, (store, attr) in zip(STATE_VARIABLES, _stores(subcatchment)):
+            if store is not None:
+                state[name][i, :] = getattr(store, attr)
+    return state
+
+
+def set_catchmod_initial_state(catchmod, state, columns):
+    """Set the initial state of a catchmod model from columns of a saved state.
+
+    `columns` gives the column of `state` for each of the model's combinations. The model is reset
+    to the new initial state, and later resets return to it rather than to the original state.
+    """
+    for i, subcatchment in enumerate(catchmod.subcatchments):
+        for name, (store, attr) in zip(STATE_VARIABLES, _stores(subcatchment)):
+            if store is not None:
+                setattr(store, 'initial_' + ('outflow' if attr == 'previous_outflow' else attr),
+                        np.ascontiguousarray(state[name][i, columns], dtype=np.float64))
+    catchmod.reset()
+
+
+def save_catchmod_state(filename, catchmod, weather_members, cc_members, date):
+    """Save the state of a catchmod model simulating the given weather and climate change members."""
+    np.savez(filename, weather_members=np.asarray(weather_members), cc_members=np.asarray(cc_members),
+             date=np.array(str(date)), **catchmod_state(catchmod))
+
+
+def load_catchmod_state(filename):
+    """Load a state saved by `save_catchmod_state` as a dict of arrays."""
+    with np.load(filename) as data:
+        return {k: data[k] for k in data.files}
+
+
+def state_columns(state, weather_members, cc_members):
+    """Return the columns of a saved state of each (weather, climate change) member pair."""
+    columns = {(w, c): k for k, (w, c) in enumerate(zip(state['weather_members'], state['cc_members']))}
+    try:
+        return np.array([columns[(w, c)] for w, c in zip(weather_members, cc_members)], dtype=np.intp)
+    except KeyError as err:
+        raise ValueError('The catchmod state does not contain the scenario combination {}.'.format(err.args[0]))
+
+
+def _snapshot_index(model, date, timestep):
+    # Index of the timestep containing date, or -1 if no snapshot is taken.
+    if date is None:
+        return -1
+    import pandas
+    return (pandas.Timestamp(date) - pandas.Timestamp(model.timestepper.start)).days // timestep
 
 
 cdef class CatchmodParameter(Parameter):
@@ -19,6 +322,40 @@ cdef class CatchmodParameter(Parameter):
 
     This parameter is index based on the input rainfall and pet values.
 
+    Only the combinations of the weather and climate change scenarios used by the model are simulated
+    if `catchmod_factory`, a function returning a catchmod model for a given number of combinations,
+    is given (see `pywr_extras.hydrology.catchmod_factory`) or `catchmod` is sized for those
+    combinations. Otherwise every combination is simulated.
+
+    The rainfall and pet may be in-memory arrays or on-disk sources (see `InputWindow`) that are read
+    `chunk_size` days at a time as the model is simulated.
+
+    The perturbation of the inputs by the climate change factors and the totalling of the
+    subcatchment flows are split across `num_threads` threads (requires building with OpenMP).
+    The results are identical for any number of threads.
+
+    The time spent in `before` is recorded in `pywr_extras.timing.stats` while timing is enabled.
+
+    If `use_flow_cache` is true the total outflow of each timestep is stored as it is simulated, and
+    later runs lookup the stored flows instead of stepping catchmod. The flows are stored in memory,
+    or in a memory-mapped file if `flow_cache_filename` is given (with the process id appended in
+    the worker processes of a pool). The cache is cleared when the inputs, the catchmod model's
+    parameters or initial state, or the model's timestepper change. If the model is set up again
+    using a subset of the combinations in the cache (e.g. when racing candidates in
+    `pywr_extras.optimisation`) the cached combinations continue to be simulated so the cache is
+    kept.
+
+    If `state_snapshot_date` and `state_snapshot_filename` are given the state of catchmod at the
+    end of the timestep containing that date is saved (see `save_catchmod_state`). A model starting
+    the following day can then pass the file as `initial_state_filename` so that catchmod starts
+    from the warmed up state of each scenario combination rather than its original initial state.
+    The inputs of that model must begin on its start date.
+
+    If `single_precision` is true the inputs are stored and read as float32 (see `InputWindow`).
+    The perturbed inputs, catchmod's state and the total outflow remain double precision, so the
+    flows differ from the double precision path only by the rounding of the inputs. Use
+    `pywr_extras.hydrology.check_single_precision` to check a model is within tolerance.
+
     """
     cdef int _scenario_index
     cdef int _cc_scenario_index
@@ -29,21 +366,45 @@ cdef class CatchmodParameter(Parameter):
     cdef double[:, :] percolation
     cdef double[:] _perturbed_rainfall
     cdef double[:] _perturbed_pet
-    cdef double[:, :] rainfall
+    cdef InputWindow rainfall
     cdef double[:, :] rainfall_factors
-    cdef double[:, :] pet
+    cdef InputWindow pet
     cdef double[:, :] pet_factors
     cdef Scenario scenario
     cdef Scenario climate_change_scenario
     cdef Catchment catchmod
+    cdef public object catchmod_factory
+    cdef int[:] _weather_members
+    cdef int[:] _cc_members
+    cdef int[:] _combination_map
+    cdef public int num_threads
+    cdef public bint use_flow_cache
+    cdef public object flow_cache_filename
+    cdef object _flow_cache_key
+    cdef double[:, :] _flow_cache
+    cdef int[:] _flow_cache_month
+    cdef int _flow_cache_size
+    cdef int _catchmod_index
+    cdef public object initial_state_filename
+    cdef public object state_snapshot_date
+    cdef public object state_snapshot_filename
+    cdef int _snapshot_index
 
     def __init__(self, catchmod, scenario, climate_change_scenario, rainfall, pet,
                  rainfall_factors, pet_factors, *args, **kwargs):
+        chunk_size = kwargs.pop('chunk_size', 365)
+        self.catchmod_factory = kwargs.pop('catchmod_factory', None)
+        self.num_threads = kwargs.pop('num_threads', 1)
+        self.use_flow_cache = kwargs.pop('use_flow_cache', False)
+        self.flow_cache_filename = kwargs.pop('flow_cache_filename', None)
+        self.initial_state_filename = kwargs.pop('initial_state_filename', None)
+        self.state_snapshot_date = kwargs.pop('state_snapshot_date', None)
+        self.state_snapshot_filename = kwargs.pop('state_snapshot_filename', None)
+        single_precision = kwargs.pop('single_precision', False)
         super(CatchmodParameter, self).__init__(*args, **kwargs)
 
-        if scenario.size*climate_change_scenario.size != catchmod.size:
-            raise ValueError("The size of the catchmod model must be the same as the product of the weather and"
-                             " climate change scenarios.")
+        if catchmod is None and self.catchmod_factory is None:
+            raise ValueError("Either a catchmod model or a catchmod_factory must be given.")
         if scenario.size != rainfall.shape[1]:
             raise ValueError("Rainfall data must be the same shape as the weather scenario.")
         if scenario.size != pet.shape[1]:
@@ -56,11 +417,44 @@ cdef class CatchmodParameter(Parameter):
         self.scenario = scenario
         self.climate_change_scenario = climate_change_scenario
         self.catchmod = catchmod
-        self.rainfall = rainfall
+        self.rainfall = _as_input_window(rainfall, chunk_size, single_precision)
         self.rainfall_factors = rainfall_factors
         self.pet_factors = pet_factors
-        self.pet = pet
+        self.pet = _as_input_window(pet, chunk_size, single_precision)
         self._prev_index = -1
+        self._flow_cache_key = None
+        self._flow_cache = None
+        self._flow_cache_size = 0
+        self._catchmod_index = 0
+
+    property single_precision:
+        def __get__(self):
+            return self.rainfall.single_precision
+
+        def __set__(self, value):
+            self.rainfall = _as_input_window(self.rainfall, self.rainfall.chunk_size, value)
+            self.pet = _as_input_window(self.pet, self.pet.chunk_size, value)
+
+    property inputs:
+        """The rainfall and pet `InputWindow`."""
+        def __get__(self):
+            return self.rainfall, self.pet
+
+        def __set__(self, value):
+            self.rainfall, self.pet = value
+
+    def clear_flow_cache(self):
+        """Discard the cached flows. A new cache is allocated when the model is next setup."""
+        self._flow_cache_key = None
+        self._flow_cache = None
+        self._flow_cache_size = 0
+
+    property flow_cache:
+        """The total outflow of each timestep stored in the flow cache."""
+        def __get__(self):
+            if self._flow_cache is None:
+                return None
+            return np.asarray(self._flow_cache[:self._flow_cache_size])
 
     cpdef setup(self, model):
         # Store the model's timestep locally.
@@ -70,6 +464,8 @@ cdef class CatchmodParameter(Parameter):
         # so that it can return the correct value in value()
         self._scenario_index = model.scenarios.get_scenario_index(self.scenario)
         self._cc_scenario_index = model.scenarios.get_scenario_index(self.climate_change_scenario)
+        self._setup_combinations(model)
+        initial_state = self._setup_state(model)
 
         # Array to store the outflow results at each timestep
         nsubs = len(self.catchmod.subcatchments)
@@ -78,45 +474,154 @@ cdef class CatchmodParameter(Parameter):
         self.percolation = np.empty((nsubs, self.catchmod.size))
         self._prev_index = -1
         # work arrays for computing outer product of rainfall/pet with climate change factors
-        self._perturbed_rainfall = np.empty(self.scenario.size*self.climate_change_scenario.size)
+        self._perturbed_rainfall = np.empty(self.catchmod.size)
         self._perturbed_pet = np.empty_like(self._perturbed_rainfall)
 
-    cpdef before(self, Timestep ts):
-        # Step the catchmod model forward
-        cdef int index, i, j, k, m
-        cdef double flow
-        if ts._index != self._prev_index:
-            for j in range(self.total_outflow.shape[0]):
-                self.total_outflow[j] = 0.0
+        if self.use_flow_cache:
+            key = flow_cache_key(model, [self.rainfall, self.pet, self.rainfall_factors, self.pet_factors,
+                                         self._weather_members, self._cc_members] + initial_state,
+                                  single_precision=self.single_precision, catchmod=catchmod_token(self.catchmod))
+            if key != self._flow_cache_key:
+                self._flow_cache = _allocate_flow_cache(self.rainfall.length, self._timestep,
+                                                        self.catchmod.size, self.flow_cache_filename)
+                self._flow_cache_month = np.empty(self._flow_cache.shape[0], dtype=np.int32)
+                self._flow_cache_size = 0
+                self._flow_cache_key = key
+        else:
+            self._flow_cache_key = None
+            self._flow_cache = None
+            self._flow_cache_size = 0
+
+    def _setup_combinations(self, model):
+        # Only the scenario combinations used by the model are simulated. The catchmod model is
+        # created for those combinations if a factory is given; a catchmod model sized for every
+        # combination of the weather and climate change scenarios simulates them all.
+        nweather, ncc = self.scenario.size, self.climate_change_scenario.size
+        pairs = active_combinations(model, self.scenario, self.climate_change_scenario)
+        if self.use_flow_cache and self._flow_cache_key is not None:
+            pairs = _cached_pairs(pairs, self._weather_members, self._cc_members)
+        if self.catchmod_factory is not None and (self.catchmod is None or self.catchmod.size != len(pairs)):
+            self.catchmod = self.catchmod_factory(len(pairs))
+
+        if self.catchmod.size == nweather*ncc:
+            pairs = np.array([(i, j) for i in range(nweather) for j in range(ncc)], dtype=np.int32)
+        elif self.catchmod.size != len(pairs):
+            raise ValueError("The size of the catchmod model must be the same as the number of scenario"
+                             " combinations used, or the product of the weather and climate change scenarios.")
+
+        self._weather_members = np.ascontiguousarray(pairs[:, 0])
+        self._cc_members = np.ascontiguousarray(pairs[:, 1])
+        combination_map = np.empty(nweather*ncc, dtype=np.int32)
+        combination_map[:] = -1
+        combination_map[pairs[:, 0]*ncc + pairs[:, 1]] = np.arange(len(pairs), dtype=np.int32)
+        self._combination_map = combination_map
+
+    def _setup_state(self, model):
+        # Start catchmod from a saved state; returns the state's arrays to identify the flows.
+        self._snapshot_index = _snapshot_index(model, self.state_snapshot_date, self._timestep)
+        if self.state_snapshot_date is not None and self.state_snapshot_filename is None:
+            raise ValueError("A state_snapshot_filename must be given with the state_snapshot_date.")
+
+        if self.initial_state_filename is None:
+            return []
+        state = load_catchmod_state(self.initial_state_filename)
+        columns = state_columns(state, self._weather_members, self._cc_members)
+        set_catchmod_initial_state(self.catchmod, state, columns)
+        return [state[name][:, columns] for name in STATE_VARIABLES]
+
+    def _save_snapshot(self, Timestep ts):
+        if self._catchmod_index != ts._index + 1:
+            # The flows were taken from the cache; bring catchmod's state up to date.
+            self._replay(ts._index + 1)
+        save_catchmod_state(self.state_snapshot_filename, self.catchmod, self._weather_members, self._cc_members,
+                            ts.datetime)
+
+    cpdef reset(self):
+        # Restart catchmod from its initial state so that each run is independent of the previous one.
+        self.catchmod.reset()
+        self._catchmod_index = 0
+        self._prev_index = -1
 
-            # Catchmod must run daily. So if a non-daily timestep is used we still simulate catchmod at
-            # a daily level and simply average the results.
+    cpdef before(self, Timestep ts):
+        cdef int i, m
+        cdef double t0 = 0.0
+        cdef bint timed = timing.stats.enabled
+        if timed:
+            t0 = perf_counter()
 
+        if ts._index != self._prev_index:
             # TODO month is the month at the end of the timestep. It does not vary through the subdaily timesteps
             m = ts.datetime.month - 1
-            for i in range(self._timestep):
-                index = ts.index*self._timestep + i
-                # Compute perturbed rainfall/pet by multiplying by climate change factors
-                outer(self.rainfall[index, :], self.rainfall_factors[m, :], self._perturbed_rainfall)
-                outer(self.pet[index, :], self.pet_factors[m, :], self._perturbed_pet)
-
-                self.catchmod.step(self._perturbed_rainfall, self._perturbed_pet, self.percolation, self.outflow)
-                # Total the outflow from the subcatchments and average over the timesteps
-                for j in range(self.total_outflow.shape[0]):
-                    # Sum the total flow across all subcatchments for index j
-                    flow = 0.0
-                    for k in range(self.outflow.shape[0]):
-                        flow += self.outflow[k, j]
-                    # Add to the total flow variable
-                    # TODO it might be marginally more efficient to do these divisions once at the end.
-                    self.total_outflow[j] += flow/self._timestep
-            self._prev_index = ts.index
+
+            if ts._index < self._flow_cache_size:
+                self.total_outflow[:] = self._flow_cache[ts._index, :]
+            else:
+                if self._catchmod_index != ts._index:
+                    # Earlier timesteps were taken from the cache; bring catchmod's state up to date.
+                    self._replay(ts._index)
+
+                self._simulate(ts._index, m)
+
+                if self._flow_cache is not None and ts._index == self._flow_cache_size:
+                    self._flow_cache[ts._index, :] = self.total_outflow
+                    self._flow_cache_month[ts._index] = m
+                    self._flow_cache_size += 1
+            if ts._index == self._snapshot_index:
+                self._save_snapshot(ts)
+                # Only one snapshot is saved after each setup
+                self._snapshot_index = -1
+            self._prev_index = ts._index
+
+        if timed:
+            timing.stats.add('{}.before'.format(self.__class__.__name__), perf_counter() - t0)
+
+    cdef _replay(self, int ts_index):
+        # Simulate catchmod from its initial state up to (but not including) ts_index
+        cdef int i
+        self.catchmod.reset()
+        for i in range(ts_index):
+            self._simulate(i, self._flow_cache_month[i])
+
+    cdef _simulate(self, int ts_index, int m):
+        # Step the catchmod model forward
+        cdef int index, i, j
+        cdef double[:] rainfall, pet
+        cdef float[:] rainfall32, pet32
+        for j in range(self.total_outflow.shape[0]):
+            self.total_outflow[j] = 0.0
+
+        # Catchmod must run daily. So if a non-daily timestep is used we still simulate catchmod at
+        # a daily level and simply average the results.
+        for i in range(self._timestep):
+            index = ts_index*self._timestep + i
+            # Compute perturbed rainfall/pet by multiplying by climate change factors
+            if self.rainfall.single_precision:
+                rainfall32 = self.rainfall.row32(index)
+                pet32 = self.pet.row32(index)
+                with nogil:
+                    perturb(rainfall32, self.rainfall_factors[m, :], pet32, self.pet_factors[m, :],
+                            self._weather_members, self._cc_members, self._perturbed_rainfall,
+                            self._perturbed_pet, self.num_threads)
+            else:
+                rainfall = self.rainfall.row(index)
+                pet = self.pet.row(index)
+                with nogil:
+                    perturb(rainfall, self.rainfall_factors[m, :], pet, self.pet_factors[m, :],
+                            self._weather_members, self._cc_members, self._perturbed_rainfall,
+                            self._perturbed_pet, self.num_threads)
+
+            self.catchmod.step(self._perturbed_rainfall, self._perturbed_pet, self.percolation, self.outflow)
+            # Total the outflow from the subcatchments and average over the timesteps
+            # TODO it might be marginally more efficient to do these divisions once at the end.
+            with nogil:
+                accumulate_outflow(self.outflow, self.total_outflow, self._timestep, self.num_threads)
+        self._catchmod_index = ts_index + 1
 
     cpdef double value(self, Timestep ts, ScenarioIndex scenario_index) except? -1:
         cdef int i = scenario_index._indices[self._scenario_index]
         cdef int n = self.climate_change_scenario._size
         cdef int j = scenario_index._indices[self._cc_scenario_index]
-        return self.total_outflow[i*n+j]
+        return self.total_outflow[self._combination_map[i*n+j]]
 
 
 cdef class OudinCatchmodParameter(Parameter):
@@ -124,6 +629,10 @@ cdef class OudinCatchmodParameter(Parameter):
 
     This parameter is index based on the input rainfall and pet values.
 
+    See `CatchmodParameter` for a description of the `catchmod_factory`, `chunk_size`, `num_threads`,
+    `use_flow_cache`, `flow_cache_filename`, `initial_state_filename`, `state_snapshot_date`,
+    `state_snapshot_filename` and `single_precision` arguments.
+
     """
     cdef int _scenario_index
     cdef int _cc_scenario_index
@@ -134,22 +643,47 @@ cdef class OudinCatchmodParameter(Parameter):
     cdef double[:, :] percolation
     cdef double[:] _perturbed_rainfall
     cdef double[:] _perturbed_temp
-    cdef double[:, :] rainfall
+    cdef InputWindow rainfall
     cdef double[:, :] rainfall_factors
-    cdef double[:, :] temp
+    cdef InputWindow temp
     cdef double[:, :] temp_factors
     cdef double[:] pet
     cdef Scenario scenario
     cdef Scenario climate_change_scenario
     cdef OudinCatchment catchmod
+    cdef public object catchmod_factory
+    cdef int[:] _weather_members
+    cdef int[:] _cc_members
+    cdef int[:] _combination_map
+    cdef public int num_threads
+    cdef public bint use_flow_cache
+    cdef public object flow_cache_filename
+    cdef object _flow_cache_key
+    cdef double[:, :] _flow_cache
+    cdef int[:] _flow_cache_month
+    cdef int[:] _flow_cache_dayofyear
+    cdef int _flow_cache_size
+    cdef int _catchmod_index
+    cdef public object initial_state_filename
+    cdef public object state_snapshot_date
+    cdef public object state_snapshot_filename
+    cdef int _snapshot_index
 
     def __init__(self, catchmod, scenario, climate_change_scenario, rainfall, temperature,
                  rainfall_factors, temperature_factors, *args, **kwargs):
+        chunk_size = kwargs.pop('chunk_size', 365)
+        self.catchmod_factory = kwargs.pop('catchmod_factory', None)
+        self.num_threads = kwargs.pop('num_threads', 1)
+        self.use_flow_cache = kwargs.pop('use_flow_cache', False)
+        self.flow_cache_filename = kwargs.pop('flow_cache_filename', None)
+        self.initial_state_filename = kwargs.pop('initial_state_filename', None)
+        self.state_snapshot_date = kwargs.pop('state_snapshot_date', None)
+        self.state_snapshot_filename = kwargs.pop('state_snapshot_filename', None)
+        single_precision = kwargs.pop('single_precision', False)
         super(OudinCatchmodParameter, self).__init__(*args, **kwargs)
 
-        if scenario.size*climate_change_scenario.size != catchmod.size:
-            raise ValueError("The size of the catchmod model must be the same as the product of the weather and"
-                             " climate change scenarios.")
+        if catchmod is None and self.catchmod_factory is None:
+            raise ValueError("Either a catchmod model or a catchmod_factory must be given.")
         if scenario.size != rainfall.shape[1]:
             raise ValueError("Rainfall data must be the same shape as the weather scenario.")
         if scenario.size != temperature.shape[1]:
@@ -162,11 +696,44 @@ cdef class OudinCatchmodParameter(Parameter):
         self.scenario = scenario
         self.climate_change_scenario = climate_change_scenario
         self.catchmod = catchmod
-        self.rainfall = rainfall
+        self.rainfall = _as_input_window(rainfall, chunk_size, single_precision)
         self.rainfall_factors = rainfall_factors
         self.temp_factors = temperature_factors
-        self.temp = temperature
+        self.temp = _as_input_window(temperature, chunk_size, single_precision)
         self._prev_index = -1
+        self._flow_cache_key = None
+        self._flow_cache = None
+        self._flow_cache_size = 0
+        self._catchmod_index = 0
+
+    property single_precision:
+        def __get__(self):
+            return self.rainfall.single_precision
+
+        def __set__(self, value):
+            self.rainfall = _as_input_window(self.rainfall, self.rainfall.chunk_size, value)
+            self.temp = _as_input_window(self.temp, self.temp.chunk_size, value)
+
+    property inputs:
+        """The rainfall and temperature `InputWindow`."""
+        def __get__(self):
+            return self.rainfall, self.temp
+
+        def __set__(self, value):
+            self.rainfall, self.temp = value
+
+    def clear_flow_cache(self):
+        """Discard the cached flows. A new cache is allocated when the model is next setup."""
+        self._flow_cache_key = None
+        self._flow_cache = None
+        self._flow_cache_size = 0
+
+    property flow_cache:
+        """The total outflow of each timestep stored in the flow cache."""
+        def __get__(self):
+            if self._flow_cache is None:
+                return None
+            return np.asarray(self._flow_cache[:self._flow_cache_size])
 
     cpdef setup(self, model):
         # Store the model's timestep locally.
@@ -176,6 +743,8 @@ cdef class OudinCatchmodParameter(Parameter):
         # so that it can return the correct value in value()
         self._scenario_index = model.scenarios.get_scenario_index(self.scenario)
         self._cc_scenario_index = model.scenarios.get_scenario_index(self.climate_change_scenario)
+        self._setup_combinations(model)
+        initial_state = self._setup_state(model)
 
         # Array to store the outflow results at each timestep
         nsubs = len(self.catchmod.subcatchments)
@@ -186,53 +755,163 @@ cdef class OudinCatchmodParameter(Parameter):
 
         self._prev_index = -1
         # work arrays for computing outer product of rainfall/pet with climate change factors
-        self._perturbed_rainfall = np.empty(self.scenario.size*self.climate_change_scenario.size)
+        self._perturbed_rainfall = np.empty(self.catchmod.size)
         self._perturbed_temp = np.empty_like(self._perturbed_rainfall)
 
-    cpdef before(self, Timestep ts):
-        # Step the catchmod model forward
-        cdef int index, i, j, k, m, doy, nt
-        cdef double flow
-        if ts._index != self._prev_index:
-            for j in range(self.total_outflow.shape[0]):
-                self.total_outflow[j] = 0.0
+        if self.use_flow_cache:
+            key = flow_cache_key(model, [self.rainfall, self.temp, self.rainfall_factors, self.temp_factors,
+                                         self._weather_members, self._cc_members] + initial_state,
+                                  single_precision=self.single_precision, catchmod=catchmod_token(self.catchmod))
+            if key != self._flow_cache_key:
+                self._flow_cache = _allocate_flow_cache(min(self.rainfall.length, self.temp.length),
+                                                        self._timestep, self.catchmod.size, self.flow_cache_filename)
+                self._flow_cache_month = np.empty(self._flow_cache.shape[0], dtype=np.int32)
+                self._flow_cache_dayofyear = np.empty(self._flow_cache.shape[0], dtype=np.int32)
+                self._flow_cache_size = 0
+                self._flow_cache_key = key
+        else:
+            self._flow_cache_key = None
+            self._flow_cache = None
+            self._flow_cache_size = 0
+
+    def _setup_combinations(self, model):
+        # Only the scenario combinations used by the model are simulated. The catchmod model is
+        # created for those combinations if a factory is given; a catchmod model sized for every
+        # combination of the weather and climate change scenarios simulates them all.
+        nweather, ncc = self.scenario.size, self.climate_change_scenario.size
+        pairs = active_combinations(model, self.scenario, self.climate_change_scenario)
+        if self.use_flow_cache and self._flow_cache_key is not None:
+            pairs = _cached_pairs(pairs, self._weather_members, self._cc_members)
+        if self.catchmod_factory is not None and (self.catchmod is None or self.catchmod.size != len(pairs)):
+            self.catchmod = self.catchmod_factory(len(pairs))
+
+        if self.catchmod.size == nweather*ncc:
+            pairs = np.array([(i, j) for i in range(nweather) for j in range(ncc)], dtype=np.int32)
+        elif self.catchmod.size != len(pairs):
+            raise ValueError("The size of the catchmod model must be the same as the number of scenario"
+                             " combinations used, or the product of the weather and climate change scenarios.")
+
+        self._weather_members = np.ascontiguousarray(pairs[:, 0])
+        self._cc_members = np.ascontiguousarray(pairs[:, 1])
+        combination_map = np.empty(nweather*ncc, dtype=np.int32)
+        combination_map[:] = -1
+        combination_map[pairs[:, 0]*ncc + pairs[:, 1]] = np.arange(len(pairs), dtype=np.int32)
+        self._combination_map = combination_map
+
+    def _setup_state(self, model):
+        # Start catchmod from a saved state; returns the state's arrays to identify the flows.
+        self._snapshot_index = _snapshot_index(model, self.state_snapshot_date, self._timestep)
+        if self.state_snapshot_date is not None and self.state_snapshot_filename is None:
+            raise ValueError("A state_snapshot_filename must be given with the state_snapshot_date.")
+
+        if self.initial_state_filename is None:
+            return []
+        state = load_catchmod_state(self.initial_state_filename)
+        columns = state_columns(state, self._weather_members, self._cc_members)
+        set_catchmod_initial_state(self.catchmod, state, columns)
+        return [state[name][:, columns] for name in STATE_VARIABLES]
+
+    def _save_snapshot(self, Timestep ts):
+        if self._catchmod_index != ts._index + 1:
+            # The flows were taken from the cache; bring catchmod's state up to date.
+            self._replay(ts._index + 1)
+        save_catchmod_state(self.state_snapshot_filename, self.catchmod, self._weather_members, self._cc_members,
+                            ts.datetime)
+
+    cpdef reset(self):
+        # Restart catchmod from its initial state so that each run is independent of the previous one.
+        self.catchmod.reset()
+        self._catchmod_index = 0
+        self._prev_index = -1
 
-            # Catchmod must run daily. So if a non-daily timestep is used we still simulate catchmod at
-            # a daily level and simply average the results.
+    cpdef before(self, Timestep ts):
+        cdef int i, m, dayofyear
+        cdef double t0 = 0.0
+        cdef bint timed = timing.stats.enabled
+        if timed:
+            t0 = perf_counter()
 
+        if ts._index != self._prev_index:
             # TODO month is the month at the end of the timestep. It does not vary through the subdaily timesteps
             m = ts.datetime.month - 1
-            nt = 0
-            for i in range(self._timestep):
-                index = ts.index*self._timestep + i
-
-                if i > 0 and (index >= self.rainfall.shape[0] or index >= self.temp.shape[0]):
-                    break
-
-                doy = ts.dayofyear - self._timestep + i + 1
-                # Compute perturbed rainfall/temperature by multiplying by climate change factors
-
-                outer(self.rainfall[index, :], self.rainfall_factors[m, :], self._perturbed_rainfall)
-                outer(self.temp[index, :], self.temp_factors[m, :], self._perturbed_temp)
-
-                self.catchmod.step(doy, self._perturbed_rainfall, self._perturbed_temp, self.pet, self.percolation, self.outflow)
-                # Total the outflow from the subcatchments and average over the timesteps
-                for j in range(self.total_outflow.shape[0]):
-                    # Sum the total flow across all subcatchments for index j
-                    flow = 0.0
-                    for k in range(self.outflow.shape[0]):
-                        flow += self.outflow[k, j]
-                    # Add to the total flow variable
-                    self.total_outflow[j] += flow
-                nt += 1
-            # Average flow over simulated timesteps and convert to Ml/d from m3/s
-            for j in range(self.total_outflow.shape[0]):
-                self.total_outflow[j] /= nt
-
-            self._prev_index = ts.index
+            dayofyear = ts.dayofyear
+
+            if ts._index < self._flow_cache_size:
+                self.total_outflow[:] = self._flow_cache[ts._index, :]
+            else:
+                if self._catchmod_index != ts._index:
+                    # Earlier timesteps were taken from the cache; bring catchmod's state up to date.
+                    self._replay(ts._index)
+
+                self._simulate(ts._index, m, dayofyear)
+
+                if self._flow_cache is not None and ts._index == self._flow_cache_size:
+                    self._flow_cache[ts._index, :] = self.total_outflow
+                    self._flow_cache_month[ts._index] = m
+                    self._flow_cache_dayofyear[ts._index] = dayofyear
+                    self._flow_cache_size += 1
+            if ts._index == self._snapshot_index:
+                self._save_snapshot(ts)
+                # Only one snapshot is saved after each setup
+                self._snapshot_index = -1
+            self._prev_index = ts._index
+
+        if timed:
+            timing.stats.add('{}.before'.format(self.__class__.__name__), perf_counter() - t0)
+
+    cdef _replay(self, int ts_index):
+        # Simulate catchmod from its initial state up to (but not including) ts_index
+        cdef int i
+        self.catchmod.reset()
+        for i in range(ts_index):
+            self._simulate(i, self._flow_cache_month[i], self._flow_cache_dayofyear[i])
+
+    cdef _simulate(self, int ts_index, int m, int dayofyear):
+        # Step the catchmod model forward
+        cdef int index, i, j, doy, nt
+        cdef double[:] rainfall, temp
+        cdef float[:] rainfall32, temp32
+        for j in range(self.total_outflow.shape[0]):
+            self.total_outflow[j] = 0.0
+
+        # Catchmod must run daily. So if a non-daily timestep is used we still simulate catchmod at
+        # a daily level and simply average the results.
+        nt = 0
+        for i in range(self._timestep):
+            index = ts_index*self._timestep + i
+
+            if i > 0 and (index >= self.rainfall.length or index >= self.temp.length):
+                break
+
+            doy = dayofyear - self._timestep + i + 1
+            # Compute perturbed rainfall/temperature by multiplying by climate change factors
+            if self.rainfall.single_precision:
+                rainfall32 = self.rainfall.row32(index)
+                temp32 = self.temp.row32(index)
+                with nogil:
+                    perturb(rainfall32, self.rainfall_factors[m, :], temp32, self.temp_factors[m, :],
+                            self._weather_members, self._cc_members, self._perturbed_rainfall,
+                            self._perturbed_temp, self.num_threads)
+            else:
+                rainfall = self.rainfall.row(index)
+                temp = self.temp.row(index)
+                with nogil:
+                    perturb(rainfall, self.rainfall_factors[m, :], temp, self.temp_factors[m, :],
+                            self._weather_members, self._cc_members, self._perturbed_rainfall,
+                            self._perturbed_temp, self.num_threads)
+
+            self.catchmod.step(doy, self._perturbed_rainfall, self._perturbed_temp, self.pet, self.percolation, self.outflow)
+            # Total the outflow from the subcatchments and average over the timesteps
+            with nogil:
+                accumulate_outflow(self.outflow, self.total_outflow, 1.0, self.num_threads)
+            nt += 1
+        # Average flow over simulated timesteps and convert to Ml/d from m3/s
+        for j in range(self.total_outflow.shape[0]):
+            self.total_outflow[j] /= nt
+        self._catchmod_index = ts_index + 1
 
     cpdef double value(self, Timestep ts, ScenarioIndex scenario_index) except? -1:
         cdef int i = scenario_index._indices[self._scenario_index]
         cdef int n = self.climate_change_scenario._size
         cdef int j = scenario_index._indices[self._cc_scenario_index]
-        return self.total_outflow[i*n+j]
\ No newline at end of file
+        return self.total_outflow[self._combination_map[i*n+j]]
@@ -9,8 +9,18 @@ cdef class BinnedScenarioParameter(IndexParameter):
     cdef int _scenario_index
     cdef double[:] _lower_bounds
     cdef double[:] _upper_bounds
+    cdef int _version
     cpdef update_indices(self, int[:] values)
 
 cdef class BinnedParameter(IndexParameter):
     cdef public BinnedScenarioParameter binned_scenario_parameter
-    cdef public list parameters
\ No newline at end of file
+    cdef public list parameters
+    cdef int _scenario_index
+    cdef list _scenario_indices
+    cdef int _version
+    cdef list _combination_parameters
+    cdef double[:] _values
+    cdef int[:] _value_timesteps
+    cdef int[:] _indices
+    cdef int[:] _index_timesteps
+    cdef _update_combination_parameters(self)
\ No newline at end of file
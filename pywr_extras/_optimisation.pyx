@@ -22,6 +22,7 @@ cdef class BinnedScenarioParameter(IndexParameter):
         # Pre-calculate bounds
         self._lower_bounds = np.ones(self.size) * 0
         self._upper_bounds = np.ones(self.size) * self.number_of_bins
+        self._version += 1
 
     cpdef int index(self, Timestep timestep, ScenarioIndex scenario_index) except? -1:
         # This is the index of the member of this scenario in the current ScenarioIndex object
@@ -38,6 +39,8 @@ cdef class BinnedScenarioParameter(IndexParameter):
         if np.max(values) > mx:
             raise ValueError('At least one bin index greater than maximum value.')
         self._bin_indices = values
+        # Tells the BinnedParameters that the bins have changed
+        self._version += 1
 
 
     cpdef double[:] lower_bounds(self):
@@ -60,13 +63,54 @@ cdef class BinnedParameter(IndexParameter):
         # TODO enforce this for all parameters
         self.size = self.parameters[0].size
 
+    cpdef setup(self, model):
+        self._scenario_index = model.scenarios.get_scenario_index(self.binned_scenario_parameter.scenario)
+        self._scenario_indices = list(model.scenarios.combinations)
+        n = len(self._scenario_indices)
+        self._values = np.empty(n)
+        self._value_timesteps = np.empty(n, dtype=np.int32)
+        self._indices = np.empty(n, dtype=np.int32)
+        self._index_timesteps = np.empty(n, dtype=np.int32)
+        self._version = -1
+        self.reset()
+
+    cpdef reset(self):
+        # Nothing is cached for a timestep until it is evaluated
+        self._value_timesteps[:] = -1
+        self._index_timesteps[:] = -1
+
+    cdef _update_combination_parameters(self):
+        # Resolve the parameter of each scenario combination from its member's bin. This is only
+        # repeated when the bins are updated.
+        cdef ScenarioIndex scenario_index
+        cdef int[:] bins = self.binned_scenario_parameter._bin_indices
+        self._combination_parameters = [self.parameters[bins[scenario_index._indices[self._scenario_index]]]
+                                        for scenario_index in self._scenario_indices]
+        self._version = self.binned_scenario_parameter._version
+        self.reset()
+
     cpdef double value(self, Timestep timestep, ScenarioIndex scenario_index) except? -1:
-        cdef int i = self.binned_scenario_parameter.index(timestep, scenario_index)
-        return self.parameters[i].value(timestep, scenario_index)
+        cdef Parameter p
+        cdef int i = scenario_index.global_id
+        if self._version != self.binned_scenario_parameter._version:
+            self._update_combination_parameters()
+        if self._value_timesteps[i] != timestep._index:
+            # Only the parameters of bins with members are evaluated, once per timestep
+            p = self._combination_parameters[i]
+            self._values[i] = p.value(timestep, scenario_index)
+            self._value_timesteps[i] = timestep._index
+        return self._values[i]
 
     cpdef int index(self, Timestep timestep, ScenarioIndex scenario_index) except? -1:
-        cdef int i = self.binned_scenario_parameter.index(timestep, scenario_index)
-        return self.parameters[i].index(timestep, scenario_index)
+        cdef IndexParameter p
+        cdef int i = scenario_index.global_id
+        if self._version != self.binned_scenario_parameter._version:
+            self._update_combination_parameters()
+        if self._index_timesteps[i] != timestep._index:
+            p = self._combination_parameters[i]
+            self._indices[i] = p.index(timestep, scenario_index)
+            self._index_timesteps[i] = timestep._index
+        return self._indices[i]
 
     @classmethod
     def load(cls, model, data):
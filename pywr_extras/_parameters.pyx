@@ -1,5 +1,5 @@
 from pywr._core cimport Timestep, ScenarioIndex
-from pywr.parameters._parameters cimport ConstantParameter
+from pywr.parameters._parameters cimport Parameter, IndexParameter, ConstantParameter
 import numpy as np
 cimport numpy as np
 
@@ -15,4 +15,166 @@ cdef class ConstantScaledParameter(ConstantParameter):
         self._upper_bounds = np.ones(self.size) * upper_bounds
 
     cpdef double value(self, Timestep ts, ScenarioIndex scenario_index) except? -1:
-        return self._value*self.scale
\ No newline at end of file
+        return self._value*self.scale
+
+cdef class MultiZoneDemandParameter(Parameter):
+    cdef public list zones
+    cdef public double[:] baseline
+    cdef public double[:, :] profile
+    cdef public double[:, :, :] savings
+    cdef list _level_parameters
+    cdef int[:] _zone_levels
+    cdef dict _zone_parameters
+    cdef list _scenario_indices
+    cdef int[:, :] _levels
+    cdef double[:, :] _demand
+    cdef double[:] _total
+    """The demand of several zones computed together
+
+    The demand of each zone is its baseline demand multiplied by its monthly profile and demand
+    saving factor. The saving factor depends on the current level of the zone's `IndexParameter`.
+    Level zero is no demand saving; levels 1 to N take the factors in `savings`. All of the zones
+    are computed as one array operation at the start of each timestep. Use `zone_parameter` to
+    get the demand of a single zone.
+
+    Parameters
+    ----------
+    zones : list of zone names
+    baseline : array of shape (zones, )
+    profile : array of shape (12, zones)
+    savings : array of shape (levels, 12, zones), optional
+    level_parameters : list of IndexParameter (or None for no saving) for each zone, optional
+    """
+    def __init__(self, zones, baseline, profile, savings=None, level_parameters=None, **kwargs):
+        super(MultiZoneDemandParameter, self).__init__(**kwargs)
+        self.zones = list(zones)
+        nzones = len(self.zones)
+
+        self.baseline = np.array(baseline, dtype=np.float64)
+        self.profile = np.array(profile, dtype=np.float64)
+        if savings is None:
+            savings = np.empty((0, 12, nzones))
+        savings = np.array(savings, dtype=np.float64)
+        if self.baseline.shape[0] != nzones or self.profile.shape[0] != 12 or self.profile.shape[1] != nzones:
+            raise ValueError('The baseline and profile must have shapes (zones, ) and (12, zones).')
+        if savings.ndim != 3 or savings.shape[1] != 12 or savings.shape[2] != nzones:
+            raise ValueError('The savings must have shape (levels, 12, zones).')
+        # Level zero is no demand saving
+        self.savings = np.concatenate([np.ones((1, 12, nzones)), savings])
+
+        if level_parameters is None:
+            level_parameters = [None] * nzones
+        if len(level_parameters) != nzones:
+            raise ValueError('A level parameter (or None) must be given for each zone.')
+
+        # Each distinct level parameter is only evaluated once per scenario
+        self._level_parameters = []
+        zone_levels = []
+        for p in level_parameters:
+            if p is None:
+                zone_levels.append(-1)
+                continue
+            if p not in self._level_parameters:
+                self._level_parameters.append(p)
+                self.children.add(p)
+            zone_levels.append(self._level_parameters.index(p))
+        self._zone_levels = np.array(zone_levels, dtype=np.int32)
+        self._zone_parameters = {}
+
+    property level_parameters:
+        def __get__(self):
+            return [None if i < 0 else self._level_parameters[i] for i in np.asarray(self._zone_levels)]
+
+    cpdef setup(self, model):
+        self._scenario_indices = list(model.scenarios.combinations)
+        ncombinations = len(self._scenario_indices)
+        self._levels = np.zeros((ncombinations, max(len(self._level_parameters), 1)), dtype=np.int32)
+        self._demand = np.zeros((ncombinations, len(self.zones)))
+        self._total = np.zeros(ncombinations)
+
+    cpdef before(self, Timestep ts):
+        cdef int c, u, z, level
+        cdef int m = ts.datetime.month - 1
+        cdef int nlevels = self.savings.shape[0]
+        cdef ScenarioIndex scenario_index
+        cdef IndexParameter p
+        cdef double total
+
+        for u, p in enumerate(self._level_parameters):
+            for c, scenario_index in enumerate(self._scenario_indices):
+                level = p.index(ts, scenario_index)
+                if level < 0 or level >= nlevels:
+                    raise ValueError('Demand saving level ({}) of parameter "{}" is not between 0 and {}.'.format(
+                        level, p.name, nlevels - 1))
+                self._levels[c, u] = level
+
+        with nogil:
+            for c in range(self._demand.shape[0]):
+                total = 0.0
+                for z in range(self._demand.shape[1]):
+                    u = self._zone_levels[z]
+                    level = 0 if u < 0 else self._levels[c, u]
+                    self._demand[c, z] = self.baseline[z]*self.profile[m, z]*self.savings[level, m, z]
+                    total += self._demand[c, z]
+                self._total[c] = total
+
+    cpdef double value(self, Timestep ts, ScenarioIndex scenario_index) except? -1:
+        """Returns the total demand of all the zones"""
+        return self._total[scenario_index.global_id]
+
+    def zone_parameter(self, zone):
+        """Return the `MultiZoneDemandZoneParameter` of a zone (by name)"""
+        try:
+            return self._zone_parameters[zone]
+        except KeyError:
+            p = MultiZoneDemandZoneParameter(self, zone)
+            self._zone_parameters[zone] = p
+            return p
+
+    @classmethod
+    def load(cls, model, data):
+        from pywr.parameters import load_parameter, load_dataframe
+        zones = data.pop('zones')
+
+        baseline_data = dict(data.pop('baseline'))
+        column = baseline_data.pop('column')
+        baseline = load_dataframe(model, baseline_data)[column].loc[zones].values
+
+        # The profile table has a row for each zone and a column for each month
+        profile = load_dataframe(model, data.pop('profile')).loc[zones].values.T
+
+        savings = None
+        level_parameters = None
+        saving_data = data.pop('saving', None)
+        if saving_data is not None:
+            saving_data = dict(saving_data)
+            # The saving table has a row for each level and zone and a column for each month
+            levels = saving_data.pop('levels')
+            df = load_dataframe(model, saving_data)
+            savings = np.array([df.loc[[(level, zone) for zone in zones]].values.T for level in levels])
+            level_parameters = [None if p is None else load_parameter(model, p) for p in data.pop('level_parameters')]
+
+        return cls(zones, baseline, profile, savings=savings, level_parameters=level_parameters, **data)
+
+
+cdef class MultiZoneDemandZoneParameter(Parameter):
+    cdef public MultiZoneDemandParameter parent
+    cdef public object zone
+    cdef int _zone_index
+    """The demand of one zone of a `MultiZoneDemandParameter`"""
+    def __init__(self, MultiZoneDemandParameter parent, zone, **kwargs):
+        super(MultiZoneDemandZoneParameter, self).__init__(**kwargs)
+        self.parent = parent
+        self.children.add(parent)
+        self.zone = zone
+        self._zone_index = parent.zones.index(zone)
+
+    cpdef double value(self, Timestep ts, ScenarioIndex scenario_index) except? -1:
+        return self.parent._demand[scenario_index.global_id, self._zone_index]
+
+    @classmethod
+    def load(cls, model, data):
+        from pywr.parameters import load_parameter
+        parent = load_parameter(model, data.pop('parent'))
+        zone = data.pop('zone')
+        return parent.zone_parameter(zone)
@@ -22,25 +22,136 @@ cdef class ConstantParameterScaledRecorder(ParameterRecorder):
         return np.ones(len(self.model.scenarios.combinations)) * c
 
 
+cdef inline double interpolate(double v, double[:] x, double[:] y, int start, int end) nogil:
+    """Linearly interpolate v in the table x[start:end], y[start:end]"""
+    cdef int lo = start
+    cdef int hi = end - 1
+    cdef int mid
+
+    if v <= x[lo]:
+        return y[lo]
+    if v >= x[hi]:
+        return y[hi]
+
+    # Binary search for x[lo] <= v < x[hi] with hi == lo + 1
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if x[mid] <= v:
+            lo = mid
+        else:
+            hi = mid
+    return y[lo] + (y[hi] - y[lo]) * (v - x[lo]) / (x[hi] - x[lo])
+
+
+cdef class ConstantParametersScaledRecorder(Recorder):
+    cdef public list parameters
+    cdef double[:] _x, _y
+    cdef int[:] _offsets
+    cdef double[:] _costs
+    cdef double[:] _values
+    """Records the total cost of several ConstantParameters each scaled by its own piecewise-linear curve
+
+    The cost of each parameter is its value linearly interpolated in its table of `x` and `y` points,
+    with values outside the table clamped to the end points (like `np.interp`).
+    """
+    def __init__(self, model, parameters, x, y, *args, **kwargs):
+        super(ConstantParametersScaledRecorder, self).__init__(model, *args, **kwargs)
+        self.parameters = [p for p in parameters]
+        if len(x) != len(self.parameters) or len(y) != len(self.parameters):
+            raise ValueError('An x and y table must be given for each parameter.')
+
+        offsets = [0]
+        for px, py in zip(x, y):
+            if len(px) != len(py):
+                raise ValueError('The x and y tables of a parameter must be the same length.')
+            if len(px) == 0:
+                raise ValueError('The x and y tables of a parameter must not be empty.')
+            if np.any(np.diff(px) < 0):
+                raise ValueError('The x table of a parameter must be increasing.')
+            offsets.append(offsets[-1] + len(px))
+
+        self._x = np.concatenate([np.asarray(px, dtype=np.float64) for px in x])
+        self._y = np.concatenate([np.asarray(py, dtype=np.float64) for py in y])
+        self._offsets = np.array(offsets, dtype=np.int32)
+        self._costs = np.zeros(len(self.parameters))
+
+    cpdef setup(self):
+        self._values = np.zeros(len(self.model.scenarios.combinations))
+
+    property costs:
+        def __get__(self):
+            """The cost of each parameter from the last call to `values`"""
+            return np.array(self._costs)
+
+    cpdef double[:] values(self):
+        cdef ConstantParameter p
+        cdef int i
+        cdef int n = len(self.parameters)
+        cdef double[:] v = np.empty(n)
+        cdef double total = 0.0
+
+        for i, p in enumerate(self.parameters):
+            v[i] = p._value
+
+        with nogil:
+            for i in range(n):
+                self._costs[i] = interpolate(v[i], self._x, self._y, self._offsets[i], self._offsets[i+1])
+                total += self._costs[i]
+        self._values[:] = total
+        return self._values
+
+    cpdef double aggregated_value(self) except? -1:
+        return self.values()[0]
+
+
 cdef class BinnedRecorder(Recorder):
     cdef public BinnedScenarioParameter binned_scenario_parameter
     cdef public list recorders
+    cdef int[:] _combination_members
+
+    """Recorder which returns the values of one of several recorders depending on the bin of each member
 
-    """Wrapper for Parameters which caches the result"""
+    Each scenario combination takes its value from the recorder of the bin that its member of the
+    binned scenario is assigned to. Only the values of those combinations are gathered from each
+    recorder. The values are aggregated over the combinations with the recorder's `agg_func`.
+    """
     def __init__(self, model, binned_scenario_parameter, recorders, *args, **kwargs):
         super(BinnedRecorder, self).__init__(model, *args, **kwargs)
         self.binned_scenario_parameter = binned_scenario_parameter
         self.recorders = [r for r in recorders]
 
+    cpdef setup(self):
+        cdef int s = self.model.scenarios.get_scenario_index(self.binned_scenario_parameter.scenario)
+        # The member of the binned scenario in each scenario combination
+        self._combination_members = np.array([c.indices[s] for c in self.model.scenarios.combinations],
+                                             dtype=np.int32)
+
     cpdef double[:] values(self):
 
         cdef Recorder r
         cdef int i
-        cdef int[:] indices = self.binned_scenario_parameter._bin_indices
-        cdef int n = len(self.model.scenarios.combinations)
         cdef int m = len(self.recorders)
+        cdef int n = len(self.model.scenarios.combinations)
+        bins = np.array(self.binned_scenario_parameter._bin_indices)[np.array(self._combination_members)]
+
+        # Group the combinations by bin
+        order = np.argsort(bins, kind='mergesort')
+        splits = np.cumsum(np.bincount(bins, minlength=m))[:-1]
+
+        values = np.empty(n)
+        for i, combinations in enumerate(np.split(order, splits)):
+            if len(combinations) == 0:
+                continue
+            r = self.recorders[i]
+            values[combinations] = np.asarray(r.values())[combinations]
+        return values
 
-        cdef double[:, :] values = np.empty((m, n))
-        for i, r in enumerate(self.recorders):
-            values[i, :] = r.values()
-        return np.choose(np.array(indices), np.array(values))
\ No newline at end of file
+    @classmethod
+    def load(cls, model, data):
+        from pywr.parameters import load_parameter
+        from pywr.recorders import load_recorder
+        data = dict(data)
+        data.pop('type', None)
+        binned_scenario_parameter = load_parameter(model, data.pop('binned_scenario_parameter'))
+        recorders = [load_recorder(model, r) for r in data.pop('recorders')]
+        return cls(model, binned_scenario_parameter, recorders, **data)
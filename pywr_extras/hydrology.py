@@ -1,4 +1,83 @@
 import numpy as np
 import os
 from pycatchmod.utils import catchment_from_json
-from ._hydrology import CatchmodParameter, OudinCatchmodParameter
+from ._hydrology import (CatchmodParameter, OudinCatchmodParameter, InputWindow, catchmod_state,
+                         save_catchmod_state, load_catchmod_state)
+
+
+def catchmod_factory(filename):
+    """Return a function that creates the catchmod model defined in a JSON file for n scenarios.
+
+    This can be given as the `catchmod_factory` of the catchmod parameters so that only the
+    scenario combinations used by a model are simulated.
+    """
+    def factory(n):
+        return catchment_from_json(filename, n=n)
+    return factory
+
+
+# The inputs are rounded to float32 (a relative error of at most 6e-8) but everything downstream of
+# them is double precision, so errors are only amplified by catchmod's response to its inputs. These
+# tolerances leave several orders of magnitude for that amplification. The absolute tolerance covers
+# near zero flows.
+SINGLE_PRECISION_RTOL = 1e-4
+SINGLE_PRECISION_ATOL = 1e-6
+
+
+def check_single_precision(model, parameter, rtol=SINGLE_PRECISION_RTOL, atol=SINGLE_PRECISION_ATOL):
+    """Check the flows of a catchmod parameter in single precision mode against double precision.
+
+    The model is setup and run twice with a newly cleared flow cache, once with double precision
+    inputs and once with single precision inputs. Flows are compared with `numpy.isclose(single,
+    double, rtol, atol)`. The parameter must have double precision inputs. Its inputs, flow cache
+    setting and the model's setup are restored afterwards, but any existing cached flows are
+    discarded.
+
+    Returns the result of `compare_flows`.
+    """
+    if parameter.single_precision:
+        raise ValueError('The parameter must have double precision inputs to check single precision.')
+
+    inputs = parameter.inputs
+    use_flow_cache = parameter.use_flow_cache
+    flows = []
+    try:
+        parameter.use_flow_cache = True
+        for value in (False, True):
+            parameter.single_precision = value
+            # The flows must be simulated afresh with the new inputs rather than read from the cache.
+            parameter.clear_flow_cache()
+            model.setup()
+            model.run()
+            flows.append(np.array(parameter.flow_cache))
+    finally:
+        parameter.inputs = inputs
+        parameter.use_flow_cache = use_flow_cache
+        parameter.clear_flow_cache()
+        model.setup()
+
+    return compare_flows(flows[0], flows[1], rtol=rtol, atol=atol)
+
+
+def compare_flows(double, single, rtol=SINGLE_PRECISION_RTOL, atol=SINGLE_PRECISION_ATOL):
+    """Compare flows simulated with single precision inputs against those of double precision inputs.
+
+    Returns a dict of the maximum absolute and relative errors and whether all the flows are within
+    tolerance (`numpy.isclose(single, double, rtol, atol)`).
+    """
+    double = np.asarray(double, dtype=np.float64)
+    single = np.asarray(single, dtype=np.float64)
+    if double.shape != single.shape:
+        raise ValueError('The flows must be the same shape.')
+
+    error = np.abs(single - double)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        relative_error = np.where(double != 0.0, error / np.abs(double), 0.0)
+
+    return {
+        'max_absolute_error': float(error.max()) if error.size else 0.0,
+        'max_relative_error': float(relative_error.max()) if relative_error.size else 0.0,
+        'rtol': rtol,
+        'atol': atol,
+        'passed': bool(np.all(np.isclose(single, double, rtol=rtol, atol=atol))),
+    }
@@ -1,14 +1,116 @@
 import json
 from pprint import pprint
 import os
+import hashlib
+import pickle
+from collections import deque, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+class ModelDocument(object):
+    """A model's JSON data with indexes of its nodes and edges.
+
+    The helpers in this module accept a `ModelDocument` in place of the data dict. Finding nodes and
+    checking for duplicate edges then take constant rather than linear time. The document must
+    only be modified through these helpers (or its methods) to keep the indexes up to date.
+    """
+    def __init__(self, data):
+        self.data = data
+        for key, default in (("nodes", list), ("edges", list), ("parameters", dict), ("recorders", dict)):
+            if key not in data:
+                data[key] = default()
+
+        self._nodes = {}
+        for node_data in data["nodes"]:
+            # Lookups return the first node with a name, as the linear search did
+            self._nodes.setdefault(node_data["name"], node_data)
+
+        self._edges = set()
+        self._edge_prefixes = set()
+        for edge_data in data["edges"]:
+            self._index_edge(tuple(edge_data))
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def _index_edge(self, edge):
+        self._edges.add(edge)
+        for i in range(len(edge)):
+            self._edge_prefixes.add(edge[:i])
+
+    def has_edge(self, *args):
+        """Return True if an edge matches `args` over their common length (as `add_connection` checks)."""
+        if args in self._edges or args in self._edge_prefixes:
+            return True
+        return any(args[:i] in self._edges for i in range(len(args)))
+
+    def get_node(self, name):
+        try:
+            return self._nodes[name]
+        except KeyError:
+            raise KeyError("{} not found".format(name))
+
+    def add_node(self, **kwargs):
+        name = kwargs.get('name')
+        try:
+            node_data = self._nodes[name]
+        except KeyError:
+            pass
+        else:
+            if node_data.get("placeholder", False):
+                # node was just a placeholder, remove it
+                self.remove_node(name)
+            else:
+                self.update_node(**kwargs)
+                return False
+
+        self.data['nodes'].append(kwargs)
+        self._nodes[name] = kwargs
+        return True
+
+    def remove_node(self, name):
+        try:
+            node_data = self._nodes.pop(name)
+        except KeyError:
+            raise ValueError('Node with name ({}) not found.'.format(name))
+        nodes = self.data['nodes']
+        for i, other in enumerate(nodes):
+            if other is node_data:
+                del nodes[i]
+                break
+        # Index the next node with the same name, if any
+        for other in nodes:
+            if other['name'] == name:
+                self._nodes[name] = other
+                break
+
+    def add_connection(self, *args):
+        if self.has_edge(*args):
+            raise ValueError('Edge from ({}) to ({}) already exists.'.format(*args[:2]))
+        self.data['edges'].append(args)
+        self._index_edge(args)
+
+    def update_node(self, name, **kwargs):
+        try:
+            node_data = self._nodes[name]
+        except KeyError:
+            raise ValueError('Node with name ({}) not found.'.format(name))
+        node_data.update(kwargs)
+
 
 def get_node(data, name):
+    if isinstance(data, ModelDocument):
+        return data.get_node(name)
     for node in data["nodes"]:
         if node["name"] == name:
             return node
     raise KeyError("{} not found".format(name))
 
 def add_node(data, **kwargs):
+    if isinstance(data, ModelDocument):
+        return data.add_node(**kwargs)
     for node_data in data['nodes']:
         if node_data['name'] == kwargs.get('name'):
             placeholder = node_data.get("placeholder", False)
@@ -22,7 +124,19 @@ def add_node(data, **kwargs):
     data['nodes'].append(kwargs)
     return True
 
+def remove_node(data, name):
+    if isinstance(data, ModelDocument):
+        return data.remove_node(name)
+    for i, node_data in enumerate(data['nodes']):
+        if node_data['name'] == name:
+            del data['nodes'][i]
+            break
+    else:
+        raise ValueError('Node with name ({}) not found.'.format(name))
+
 def add_connection(data, *args):
+    if isinstance(data, ModelDocument):
+        return data.add_connection(*args)
     for edge_data in data['edges']:
         if all(a == b for a, b in zip(edge_data, args)):
             raise ValueError('Edge from ({}) to ({}) already exists.'.format(*args[:2]))
@@ -30,6 +144,8 @@ def add_connection(data, *args):
 
 
 def update_node(data, name, **kwargs):
+    if isinstance(data, ModelDocument):
+        return data.update_node(name, **kwargs)
     for node_data in data['nodes']:
         if node_data['name'] == name:
             node_data.update(kwargs)
@@ -41,7 +157,67 @@ def update_parameter(data, name, **kwargs):
     param_data = data['parameters'][name]
     param_data.update(kwargs)
 
-def join_models(filenames, data=None):
+def _read_json(filename):
+    with open(filename, "r") as f:
+        return json.loads(f.read())
+
+
+def load_include(filename, cache_dir=None):
+    """Load an include file, using a parse cache in `cache_dir` if given.
+
+    The parsed data of each file is pickled to the cache. It is reused while the file's path,
+    modification time and size are unchanged.
+    """
+    if cache_dir is None:
+        return _read_json(filename)
+
+    path = os.path.abspath(filename)
+    st = os.stat(path)
+    key = (path, st.st_mtime_ns, st.st_size)
+    cache_filename = os.path.join(cache_dir, hashlib.sha1(path.encode('utf-8')).hexdigest() + '.pickle')
+
+    try:
+        with open(cache_filename, 'rb') as f:
+            cached_key, include_data = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+        pass
+    else:
+        if cached_key == key:
+            return include_data
+
+    include_data = _read_json(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    # Write to a temporary file first so concurrent builds never read a partial cache entry
+    tmp_filename = '{}.{}.tmp'.format(cache_filename, os.getpid())
+    with open(tmp_filename, 'wb') as f:
+        pickle.dump((key, include_data), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_filename, cache_filename)
+    return include_data
+
+
+def _load_include(args):
+    return load_include(*args)
+
+
+def load_includes(filenames, cache_dir=None, max_workers=1):
+    """Load include files in the order given, parsing them in `max_workers` processes."""
+    filenames = list(filenames)
+    if max_workers is None or max_workers > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            # map returns the results in the order of filenames
+            for include_data in executor.map(_load_include, [(f, cache_dir) for f in filenames]):
+                yield include_data
+    else:
+        for filename in filenames:
+            yield load_include(filename, cache_dir=cache_dir)
+
+
+def join_models(filenames, data=None, cache_dir=None, max_workers=1):
+    """Join the include files in to a single model.
+
+    The files are merged in order. They are parsed in parallel if `max_workers` is greater than
+    one (or None for one worker per CPU), and a parse cache is kept in `cache_dir` if given.
+    """
     if data is None:
         data = {
             "metadata": {
@@ -57,23 +233,17 @@ def join_models(filenames, data=None):
             },
             "recorders": {}
         }
-    if "nodes" not in data.keys():
-        data["nodes"] = []
-    if "edges" not in data.keys():
-        data["edges"] = []
-    if "parameters" not in data.keys():
-        data["parameters"] = {}
-    if "recorders" not in data.keys():
-        data["recorders"] = {}
-
-    for filename in filenames:
-        with open(filename, "r") as f:
-            include_data = json.loads(f.read())
+    if isinstance(data, ModelDocument):
+        document = data
+    else:
+        document = ModelDocument(data)
+
+    for include_data in load_includes(filenames, cache_dir=cache_dir, max_workers=max_workers):
         if "nodes" in include_data.keys():
             for node_data in include_data["nodes"]:
                 if "placeholder" in node_data.keys():
                     continue
-                add_node(data, **node_data)
+                document.add_node(**node_data)
 #                 try:
 #                     add_node(data, **node_data)
 #                 except:
@@ -81,16 +251,16 @@ def join_models(filenames, data=None):
 
         if "edges" in include_data.keys():
             for edge_data in include_data["edges"]:
-                add_connection(data, *edge_data)
+                document.add_connection(*edge_data)
 
 
         if "parameters" in include_data.keys():
-            data["parameters"].update(include_data["parameters"])
+            document["parameters"].update(include_data["parameters"])
 
         if "recorders" in include_data.keys():
-            data["recorders"].update(include_data["recorders"])
+            document["recorders"].update(include_data["recorders"])
 
-    return data
+    return document.data
 
 def add_baseline_demand_parameter(data, wrz_name, table, column):
     """
@@ -202,6 +372,46 @@ def add_demand_parameters(data, wrz_name, baseline_table, baseline_column, profi
     return param_name
 
 
+def add_multizone_demand_parameters(data, name, wrz_names, baseline_table, baseline_column, profile_table,
+                                    saving_table, level_param_names, levels=(1, 2, 3, 4)):
+    """
+    Add the demand parameters for several WRZs computed together
+
+    This is equivalent to calling `add_demand_parameters` for each WRZ, but creates a single
+    "multizonedemand" parameter and a "multizonedemandzone" view of it for each WRZ. The views are
+    named as the demand parameters made by `add_demand_parameters`.
+
+    `level_param_names` is either a single parameter name used by every WRZ, or a list with a name
+    (or None for no demand saving) for each WRZ. If it is None demand saving is disabled.
+    """
+    wrz_names = list(wrz_names)
+    param = {
+        "type": "multizonedemand",
+        "zones": wrz_names,
+        "baseline": {"table": baseline_table, "column": baseline_column},
+        "profile": {"table": profile_table},
+    }
+
+    if level_param_names is not None:
+        if isinstance(level_param_names, str):
+            level_param_names = [level_param_names] * len(wrz_names)
+        param["saving"] = {"table": saving_table, "levels": list(levels)}
+        param["level_parameters"] = list(level_param_names)
+
+    data["parameters"][name] = param
+
+    param_names = []
+    for wrz_name in wrz_names:
+        param_name = "{}_demand".format(wrz_name)
+        data["parameters"][param_name] = {
+            "type": "multizonedemandzone",
+            "parent": name,
+            "zone": wrz_name
+        }
+        param_names.append(param_name)
+    return param_names
+
+
 def add_demand_saving_control_curve(data, reservoir, url, level):
 
     param = {
@@ -227,27 +437,96 @@ def add_demand_saving_index(data, reservoir, url, levels):
     data["parameter"]["{}_demand_saving_index".format(reservoir)]
 
     
+def find_external_references(data):
+    """Return every `url` and `table` reference in the data with its JSON path.
+
+    Returns a list of (path, key, value) tuples where `path` is the tuple of keys and list indices of
+    the dict containing the reference. Dicts and lists are searched in a single pass.
+    """
+    references = []
+    to_search = deque([((), data)])
+    while to_search:
+        path, item = to_search.popleft()
+        if isinstance(item, dict):
+            for key, subitem in item.items():
+                if key in ("url", "table") and isinstance(subitem, str):
+                    references.append((path, key, subitem))
+                elif isinstance(subitem, (dict, list)):
+                    to_search.append((path + (key, ), subitem))
+        elif isinstance(item, list):
+            for index, subitem in enumerate(item):
+                if isinstance(subitem, (dict, list)):
+                    to_search.append((path + (index, ), subitem))
+    return references
+
+
+def get_path(data, path):
+    for key in path:
+        data = data[key]
+    return data
+
+
 def fix_external_urls(data):
+    """Make the `url` of every external file relative to the "data" directory.
+
+    Returns the set of external filenames.
+    """
     external_filenames = set()
-    to_search = [data]
-    while True:
-        try:
-            item = to_search.pop(0)
-        except IndexError:
-            break
-        else:
-            if isinstance(item, dict):
-                for subitem in item.values():
-                    if isinstance(subitem, dict):
-                        to_search.append(subitem)
-                try:
-                    url = item["url"]
-                except: pass
-                else:
-                    if os.path.isabs(url):
-                        item["url"] = url = os.path.join("data", os.path.basename(url))
-                    # HACK the directory character - Windows can deal with /, but Linux can't deal with \
-                    item["url"] = item["url"].replace("\\", "/")
-                    external_filenames.add(url)
-
-    # pprint(external_filenames)
\ No newline at end of file
+    for path, key, url in find_external_references(data):
+        if key != "url":
+            continue
+        item = get_path(data, path)
+        if os.path.isabs(url):
+            url = os.path.join("data", os.path.basename(url))
+        # HACK the directory character - Windows can deal with /, but Linux can't deal with \
+        item["url"] = url = url.replace("\\", "/")
+        external_filenames.add(url)
+    return external_filenames
+
+
+# Keys of a parameter's data that determine how its external file is read (rather than what is
+# selected from it). References with the same values read the same table.
+TABLE_KEYS = ("url", "checksum", "index_col", "parse_dates", "dayfirst", "sheetname", "sheet_name", "key",
+              "header", "skiprows", "skipfooter", "nrows", "usecols", "names", "sep", "delimiter",
+              "encoding", "na_values", "keep_default_na", "dtype", "thousands", "decimal", "squeeze")
+
+# Keys of a parameter's data that select from the table or configure the parameter itself.
+PARAMETER_KEYS = ("type", "name", "comment", "column", "index", "indexes", "scenario", "is_variable",
+                  "lower_bounds", "upper_bounds")
+
+
+def share_tables(data):
+    """Replace repeated `url` references with references to shared entries in "tables".
+
+    Pywr reads each table once when the model is loaded, whereas a `url` is read by every
+    parameter that refers to it. References that read the same file with the same options are
+    moved to a single table. References with keys that are in neither `TABLE_KEYS` nor
+    `PARAMETER_KEYS` are left unchanged, as those keys may change how the file is read. Returns a
+    dict of the table names created to the read options.
+    """
+    groups = OrderedDict()
+    for path, key, url in find_external_references(data):
+        # Only parameters read external files; recorders may write them
+        if key != "url" or path[:1] != ("parameters", ):
+            continue
+        item = get_path(data, path)
+        if any(k not in TABLE_KEYS and k not in PARAMETER_KEYS for k in item):
+            continue
+        options = tuple((k, json.dumps(item[k], sort_keys=True)) for k in TABLE_KEYS if k in item)
+        groups.setdefault(options, []).append(item)
+
+    tables = data.setdefault("tables", {})
+    created = {}
+    for options, items in groups.items():
+        if len(items) < 2:
+            continue
+        name = "__shared_{}".format(hashlib.sha1(json.dumps(options).encode('utf-8')).hexdigest()[:12])
+        table = {k: json.loads(v) for k, v in options}
+        tables[name] = table
+        created[name] = table
+        for item in items:
+            for k in TABLE_KEYS:
+                item.pop(k, None)
+            item["table"] = name
+    return created
+
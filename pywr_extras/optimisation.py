@@ -2,8 +2,15 @@ import numpy as np
 from pywr.optimisation.moea import InspyredOptimisationModel
 import inspyred
 import copy
+import hashlib
+import json
+import multiprocessing
+import os
+import pickle
+from collections import OrderedDict
 from ._optimisation import BinnedScenarioParameter, BinnedParameter
-from .recorders import MetaRecorder
+from .recorders import MetaRecorder, RecorderValues
+from . import timing
 
 class BinnedScenarioCandidate:
     def __init__(self, initial_variables, members=None):
@@ -72,6 +79,9 @@ class MultiBinCandidate:
             b.populate_variable_array(a)
         return a
 
+    def get_bin_variables(self):
+        return [b.variables for b in self.bins]
+
     def get_bin_indices_array(self):
         indices = np.empty(self.number_of_members, dtype=np.int32)
         for i, b in enumerate(self.bins):
@@ -104,12 +114,392 @@ class MultiBinCandidate:
             self.bins[ibin].members.add(m)
 
 
+class ArrayMultiBinCandidate:
+    """A compact alternative to `MultiBinCandidate` backed by NumPy arrays.
+
+    The bin of every member is stored in a single int32 array and the variables of the bins
+    in a 2-D array with one row per bin. The (optional) bounds arrays have the same shape as
+    the variables and are shared between copies of a candidate.
+    """
+    def __init__(self, bin_indices, bin_variables, lower_bounds=None, upper_bounds=None):
+        self.bin_indices = np.array(bin_indices, dtype=np.int32)
+        self.bin_variables = np.array(bin_variables, dtype=np.float64, ndmin=2)
+        self.lower_bounds = lower_bounds
+        self.upper_bounds = upper_bounds
+
+    @property
+    def number_of_bins(self):
+        return self.bin_variables.shape[0]
+
+    @property
+    def number_of_variables(self):
+        return self.bin_variables.shape[1]
+
+    @property
+    def number_of_members(self):
+        return self.bin_indices.shape[0]
+
+    def get_variable_array(self):
+        return self.bin_variables[self.bin_indices, :]
+
+    def get_bin_variables(self):
+        return self.bin_variables
+
+    def get_bin_indices_array(self):
+        return self.bin_indices
+
+    def get_bin_members(self, ibin):
+        return np.flatnonzero(self.bin_indices == ibin)
+
+    def clip(self):
+        """Clip the bin variables to the bounds (if defined)."""
+        if self.lower_bounds is not None and self.upper_bounds is not None:
+            np.clip(self.bin_variables, self.lower_bounds, self.upper_bounds, out=self.bin_variables)
+        return self
+
+    def copy(self):
+        return self.__class__(self.bin_indices, self.bin_variables, lower_bounds=self.lower_bounds,
+                              upper_bounds=self.upper_bounds)
+
+    def __deepcopy__(self, memo):
+        # The bounds are shared; only the indices and variables need copying.
+        return self.copy()
+
+
+def candidate_key(indices, bin_variables):
+    """Return a canonical hash of a candidate's bin indices and the variables of every bin."""
+    h = hashlib.sha1()
+    h.update(np.ascontiguousarray(indices, dtype=np.int32).tobytes())
+    for variables in bin_variables:
+        h.update(np.ascontiguousarray(variables, dtype=np.float64).tobytes())
+    return h.hexdigest()
+
+
+class FitnessCache:
+    """A bounded cache of evaluated fitness with least recently used eviction.
+
+    Entries are keyed using `candidate_key`. The number of hits and misses are counted.
+    """
+    def __init__(self, maxsize=1024):
+        if maxsize < 1:
+            raise ValueError('The maximum size of the cache must be at least one.')
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        """Return the cached fitness for key, or None if it is not in the cache."""
+        try:
+            fit = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return fit
+
+    def put(self, key, fit):
+        self._entries[key] = fit
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+# Hash bucket and sign of every (member, bin) pair, keyed by the number of members, bins and buckets.
+_feature_hashes = {}
+
+
+def _get_feature_hashes(number_of_members, number_of_bins, number_of_hashes):
+    key = (number_of_members, number_of_bins, number_of_hashes)
+    try:
+        return _feature_hashes[key]
+    except KeyError:
+        pass
+    # A fixed seed so the features of a candidate are the same in every process and run
+    rng = np.random.RandomState(0)
+    buckets = rng.randint(0, number_of_hashes, size=(number_of_members, number_of_bins))
+    signs = rng.choice([-1.0, 1.0], size=(number_of_members, number_of_bins))
+    _feature_hashes[key] = buckets, signs
+    return buckets, signs
+
+
+def surrogate_features(indices, bin_variables, number_of_bins, number_of_hashes=64):
+    """Return the surrogate features of a candidate.
+
+    The features are the fraction of the members in each bin, the one-hot encoding of the bin of
+    every member hashed in to `number_of_hashes` signed buckets, and the variables of every bin.
+    Their number does not depend on the number of members, but moving a member between bins
+    changes them.
+    """
+    indices = np.asarray(indices)
+    members = np.arange(len(indices))
+    fractions = np.bincount(indices, minlength=number_of_bins) / float(len(indices))
+    buckets, signs = _get_feature_hashes(len(indices), number_of_bins, number_of_hashes)
+    hashed = np.bincount(buckets[members, indices], weights=signs[members, indices], minlength=number_of_hashes)
+    hashed /= np.sqrt(len(indices))
+    return np.concatenate([fractions, hashed, np.ravel(np.asarray(bin_variables, dtype=np.float64))])
+
+
+class SurrogateModel:
+    """A ridge regression of the objectives on the surrogate features of evaluated candidates.
+
+    The sums of the regression's normal equations are accumulated, so adding evaluated candidates
+    and refitting does not depend on the number of earlier candidates. `predict` returns the
+    predicted objectives and their standard errors.
+    """
+    def __init__(self, number_of_features, number_of_objectives, alpha=1.0):
+        n = number_of_features + 1  # including the intercept
+        self.alpha = alpha
+        self.xtx = np.zeros((n, n))
+        self.xty = np.zeros((n, number_of_objectives))
+        self.yty = np.zeros(number_of_objectives)
+        self.size = 0
+        self.coefficients = None
+        self._a = None
+        self._variance = None
+
+    @staticmethod
+    def _design(features):
+        features = np.atleast_2d(features)
+        return np.hstack([np.ones((features.shape[0], 1)), features])
+
+    def add(self, features, objectives):
+        x = self._design(features)
+        y = np.atleast_2d(objectives)
+        self.xtx += x.T.dot(x)
+        self.xty += x.T.dot(y)
+        self.yty += np.sum(y**2, axis=0)
+        self.size += x.shape[0]
+
+    def fit(self):
+        a = self.xtx + self.alpha * np.eye(self.xtx.shape[0])
+        w = np.linalg.solve(a, self.xty)
+        self._a = a
+        self.coefficients = w
+        # Residual sum of squares of each objective from the accumulated sums
+        rss = self.yty - 2 * np.sum(w * self.xty, axis=0) + np.sum(w * self.xtx.dot(w), axis=0)
+        self._variance = np.maximum(rss, 0.0) / max(self.size - 1, 1)
+
+    def predict(self, features):
+        x = self._design(features)
+        mean = x.dot(self.coefficients)
+        leverage = np.sum(np.linalg.solve(self._a, x.T) * x.T, axis=0)
+        std = np.sqrt(np.outer(leverage, self._variance))
+        return mean, std
+
+
+class ParetoArchive:
+    """An archive of the non-dominated solutions found during an optimisation.
+
+    Solutions are added one at a time with `add`. A solution dominated by (or equal to) an archived
+    solution is rejected and the archived solutions it dominates are removed. The solutions are
+    kept sorted by their first objective, so only those that could dominate, or be dominated by, a
+    new solution are compared with it. With two objectives the check is a binary search.
+
+    The size of the archive can be bounded in two ways. If `epsilon` (a scalar or one value per
+    objective) is given, solutions are compared using epsilon-dominance: the objective space is
+    divided in to boxes of size `epsilon` and at most one solution (the one that dominates, or
+    otherwise is nearest the best corner) is kept in each box. If `maxsize` is given, the solution
+    with the smallest crowding distance is removed whenever the archive grows beyond it.
+
+    The metadata of each solution is stored once, keyed by its `candidate_key`.
+    """
+    def __init__(self, number_of_objectives, maximize=True, epsilon=None, maxsize=None):
+        if maxsize is not None and maxsize < 2:
+            raise ValueError('The maximum size of the archive must be at least two.')
+        self.number_of_objectives = number_of_objectives
+        self.maximize = maximize
+        if epsilon is not None:
+            epsilon = np.broadcast_to(np.asarray(epsilon, dtype=np.float64), (number_of_objectives,)).copy()
+            if np.any(epsilon <= 0.0):
+                raise ValueError('Epsilon must be greater than zero.')
+        self.epsilon = epsilon
+        self.maxsize = maxsize
+        # Minimisation form of the objectives and the points (boxes if using epsilon) they are
+        # compared by, sorted by the first column of the points.
+        self._objectives = np.empty((0, number_of_objectives))
+        self._points = np.empty((0, number_of_objectives))
+        self._keys = []
+        self._meta = {}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return key in self._meta
+
+    def __iter__(self):
+        """Iterate over the (key, objectives, meta) of each archived solution."""
+        objectives = self.objectives
+        for i, key in enumerate(self._keys):
+            yield key, objectives[i, :], self._meta[key]
+
+    @property
+    def keys(self):
+        return list(self._keys)
+
+    @property
+    def objectives(self):
+        """The objectives of the archived solutions as a 2-D array."""
+        return -self._objectives if self.maximize else self._objectives.copy()
+
+    def get_meta(self, key):
+        return self._meta[key]
+
+    def add(self, key, objectives, meta=None):
+        """Add a solution to the archive. Returns True if it is archived."""
+        if key in self._meta:
+            return True
+        f = np.asarray(objectives, dtype=np.float64)
+        if self.maximize:
+            f = -f
+        p = f if self.epsilon is None else np.floor(f / self.epsilon)
+
+        first = self._points[:, 0]
+        left = np.searchsorted(first, p[0], side='left')
+        right = np.searchsorted(first, p[0], side='right')
+
+        if self.epsilon is not None:
+            same = np.flatnonzero(np.all(self._points[left:right] == p, axis=1))
+            if len(same) > 0:
+                i = left + same[0]
+                if not self._replaces(f, self._objectives[i], p * self.epsilon):
+                    return False
+                self._remove(np.array([i]))
+                self._insert(i, key, f, p, meta)
+                return self._truncate(key)
+
+        if self._is_weakly_dominated(p, right):
+            return False
+        self._remove(left + self._dominated(p, left))
+        self._insert(left, key, f, p, meta)
+        return self._truncate(key)
+
+    def _is_weakly_dominated(self, p, right):
+        # Only the points with a first objective no greater than p's can dominate it
+        if right == 0:
+            return False
+        if self.number_of_objectives == 2:
+            # The second objective of a two objective front decreases with the first
+            return self._points[right - 1, 1] <= p[1]
+        return bool(np.any(np.all(self._points[:right] <= p, axis=1)))
+
+    def _dominated(self, p, left):
+        # Only the points with a first objective no less than p's can be dominated by it
+        suffix = self._points[left:]
+        if self.number_of_objectives == 2:
+            return np.arange(np.searchsorted(-suffix[:, 1], -p[1], side='right'))
+        return np.flatnonzero(np.all(suffix >= p, axis=1))
+
+    @staticmethod
+    def _replaces(f, g, corner):
+        """Return True if f should replace g in the same epsilon box."""
+        if np.all(f <= g) and np.any(f < g):
+            return True
+        if np.all(g <= f):
+            return False
+        return np.sum((f - corner)**2) < np.sum((g - corner)**2)
+
+    def _insert(self, i, key, f, p, meta):
+        self._objectives = np.insert(self._objectives, i, f, axis=0)
+        self._points = np.insert(self._points, i, p, axis=0)
+        self._keys.insert(i, key)
+        self._meta[key] = meta
+
+    def _remove(self, positions):
+        if len(positions) == 0:
+            return
+        for i in positions:
+            del self._meta[self._keys[i]]
+        positions = set(positions.tolist())
+        self._keys = [key for i, key in enumerate(self._keys) if i not in positions]
+        self._objectives = np.delete(self._objectives, list(positions), axis=0)
+        self._points = np.delete(self._points, list(positions), axis=0)
+
+    def _truncate(self, key):
+        if self.maxsize is not None and len(self) > self.maxsize:
+            i = np.argmin(crowding_distance(self._objectives))
+            self._remove(np.array([i]))
+        return key in self._meta
+
+    def save(self, filename):
+        """Save the archived solutions to a JSON file as a list of their key, objectives and meta."""
+        data = [{'key': key, 'objectives': objectives, 'meta': meta} for key, objectives, meta in self]
+        with open(filename, mode='w') as fh:
+            json.dump(data, fh, sort_keys=True, indent=4, separators=(',', ': '), cls=NumpyEncoder)
+
+
+def crowding_distance(objectives):
+    """Return the crowding distance of each row of a 2-D array of objectives.
+
+    The extreme solutions of every objective have an infinite distance.
+    """
+    n, m = objectives.shape
+    distance = np.zeros(n)
+    if n <= 2:
+        distance[:] = np.inf
+        return distance
+
+    for j in range(m):
+        order = np.argsort(objectives[:, j], kind='mergesort')
+        values = objectives[order, j]
+        distance[order[0]] = distance[order[-1]] = np.inf
+        span = values[-1] - values[0]
+        if span > 0:
+            distance[order[1:-1]] += (values[2:] - values[:-2]) / span
+    return distance
+
+
 class InspyredBinnedOptimisationModel(InspyredOptimisationModel):
 
     def __init__(self, *args, **kwargs):
         super(InspyredBinnedOptimisationModel, self).__init__(*args, **kwargs)
         # default MetaRecorder to return when evaluating a solution
         self._meta_recorder = MetaRecorder(self)
+        # process pool for parallel evaluation; created on demand by the evaluator
+        self._pool = None
+        # cache of previously evaluated fitness; created on demand by the evaluator
+        self.fitness_cache = None
+        # keys of the last population written to a streaming archive
+        self._archived_keys = set()
+        # counts of the candidates and scenario combinations simulated when racing
+        self.racing_stats = None
+        # regression of the objectives of evaluated candidates; created on demand by the evaluator
+        self.surrogate = None
+        self.surrogate_stats = None
+        # non-dominated solutions of the whole run; created on demand by the evaluator
+        self.pareto_archive = None
+
+    @property
+    def meta_recorder(self):
+        """The `MetaRecorder` whose value is stored as the metadata of each evaluated solution.
+
+        Set to a `ColumnarMetaRecorder` to store the recorder values in a single array. The worker
+        processes of a parallel evaluation create the same class of recorder for the same recorders.
+        """
+        return self._meta_recorder
+
+    @meta_recorder.setter
+    def meta_recorder(self, recorder):
+        self._meta_recorder = recorder
+
+    def _meta_recorder_config(self):
+        # The class of the meta recorder and the names of its recorders (None for all of them)
+        recorder = self._meta_recorder
+        names = None if recorder.recorders is None else [r.name for r in recorder.recorders]
+        return recorder.__class__, names
 
     def _cache_variable_parameters(self):
         variables = []
@@ -138,11 +528,24 @@ class InspyredBinnedOptimisationModel(InspyredOptimisationModel):
         if binned_scenario_parameter is None:
             raise RuntimeError('No BinnedScenarioParameter defined as a variable.')
 
+        # Stacked bounds of the binned variables; one row per bin.
+        shp = (binned_scenario_parameter.number_of_bins, binned_variable_map[-1])
+        binned_lower_bounds = np.empty(shp)
+        binned_upper_bounds = np.empty(shp)
+        for ivar, var in enumerate(binned_variables):
+            j = slice(binned_variable_map[ivar], binned_variable_map[ivar + 1])
+            for ibin in range(shp[0]):
+                p = var.parameters[ibin]
+                binned_lower_bounds[ibin, j] = p.lower_bounds()
+                binned_upper_bounds[ibin, j] = p.upper_bounds()
+
         self._variables = variables
         self._variable_map = variable_map
         self._binned_variables = binned_variables
         self._binned_variable_map = binned_variable_map
         self._binned_scenario_parameter = binned_scenario_parameter
+        self._binned_lower_bounds = binned_lower_bounds
+        self._binned_upper_bounds = binned_upper_bounds
         print(variables, binned_variables)
 
     def generator(self, random, args):
@@ -167,35 +570,45 @@ class InspyredBinnedOptimisationModel(InspyredOptimisationModel):
                     values.append(random.uniform(l[i], u[i]))
             bin_variables.append(values)
 
+        if args.get('array_candidates', False):
+            bin_indices = np.empty(nscenarios, dtype=np.int32)
+            for ibin, members in enumerate(bin_members):
+                bin_indices[members] = ibin
+            return ArrayMultiBinCandidate(bin_indices, bin_variables, lower_bounds=self._binned_lower_bounds,
+                                          upper_bounds=self._binned_upper_bounds)
+
         return MultiBinCandidate(nbins, bin_variables=bin_variables, bin_members=bin_members)
 
-    def evaluator(self, candidates, args):
-        fitness = []
-        for i, candidate in enumerate(candidates):
-            var_meta = {}
+    def _evaluate(self, indices, bin_variables, meta=True):
+        """Simulate a single candidate given its bin indices and bin variables.
 
-            # First update the bin members
+        Returns a tuple of the objective values and the candidate's metadata (None if `meta` is False).
+        """
+        stats = timing.stats
+        var_meta = {}
 
-            indices = candidate.get_bin_indices_array()
+        # First update the bin members
+        with stats.timer('bin_indices'):
             self._binned_scenario_parameter.update_indices(indices)
             var_meta[self._binned_scenario_parameter.name] = {
                 '__class__': self._binned_scenario_parameter.__class__.__name__,
                 'values': list(indices)
             }
 
-            # Second update the binned variables
+        # Second update the binned variables
+        with stats.timer('parameters'):
             for ivar, var in enumerate(self._binned_variables):
                 bins_meta = []
                 j = slice(self._binned_variable_map[ivar], self._binned_variable_map[ivar + 1])
 
-                for ibin, bin in enumerate(candidate.bins):
+                for ibin, variables in enumerate(bin_variables):
 
                     p = var.parameters[ibin]
-                    p.update(bin.variables[j])
+                    p.update(variables[j])
 
                     bins_meta.append({
                         'name': p.name, '__class__': p.__class__.__name__,
-                        'values': bin.variables[j]
+                        'values': variables[j]
                     })
                 var_meta[var.name] = {
                     '__class__': var.__class__.__name__,
@@ -203,17 +616,311 @@ class InspyredBinnedOptimisationModel(InspyredOptimisationModel):
                     'parameters': bins_meta
                 }
 
+        with stats.timer('reset'):
             self.reset()
+        with stats.timer('run'):
             self.run()
 
-            fit = inspyred.ec.emo.Pareto([r.aggregated_value() for r in self._objectives])
-            fit.meta = {'variables': var_meta, 'objectives': self._meta_recorder.value()}
-            fitness.append(fit)
-            print(fitness[-1])
+        with stats.timer('objectives'):
+            objectives = [r.aggregated_value() for r in self._objectives]
+        if not meta:
+            return objectives, None
+        with stats.timer('meta'):
+            meta = {'variables': var_meta, 'objectives': self._meta_recorder.value()}
+        return objectives, meta
+
+    def _evaluate_task(self, indices, bin_variables, racing=None):
+        """Evaluate a candidate, racing it first if `racing` is given.
+
+        Returns the result of `_evaluate` (None if the candidate was dropped by racing) and the
+        number of scenario combinations simulated.
+        """
+        if racing is None:
+            return self._evaluate(indices, bin_variables), len(self.scenarios.combinations)
+        return self._race(indices, bin_variables, **racing)
+
+    def _race(self, indices, bin_variables, stages, archive, maximize, z):
+        """Evaluate a candidate on growing subsets of the binned scenario's members.
+
+        `stages` is a list of the members to simulate at each stage. After each stage the
+        objectives are estimated with confidence bounds of `z` standard errors of their values over
+        the simulated combinations. The candidate is dropped as soon as a member of `archive`
+        (an array of objectives) dominates even its optimistic bounds. Otherwise it is simulated
+        in full.
+
+        The model is set up again for each stage. Catchmod parameters with a flow cache keep
+        simulating (and reading from the cache) all of the combinations of the full model during
+        the stages, so racing does not clear their cache.
+        """
+        scenarios = self.scenarios
+        user_combinations = scenarios.user_combinations
+        all_combinations = [tuple(si.indices) for si in scenarios.combinations]
+        s = scenarios.get_scenario_index(self._binned_scenario_parameter.scenario)
+        simulated = 0
+
+        try:
+            for members in stages:
+                members = set(members)
+                scenarios.user_combinations = [c for c in all_combinations if c[s] in members]
+                with timing.stats.timer('racing_setup'):
+                    self.setup()
+                objectives, _ = self._evaluate(indices, bin_variables, meta=False)
+                simulated += len(scenarios.user_combinations)
+
+                objectives = np.array(objectives)
+                half_widths = np.empty_like(objectives)
+                for i, r in enumerate(self._objectives):
+                    values = np.asarray(r.values())
+                    if len(values) > 1:
+                        half_widths[i] = z * np.std(values, ddof=1) / np.sqrt(len(values))
+                    else:
+                        half_widths[i] = np.inf
+
+                if _is_dominated(objectives, half_widths, archive, maximize):
+                    return None, simulated
+        finally:
+            scenarios.user_combinations = user_combinations
+            with timing.stats.timer('racing_setup'):
+                self.setup()
+
+        return self._evaluate(indices, bin_variables), simulated + len(all_combinations)
+
+    def _surrogate_features(self, indices, bin_variables, args):
+        return surrogate_features(indices, bin_variables, self._binned_scenario_parameter.number_of_bins,
+                                  number_of_hashes=args.get('surrogate_hash_size', 64))
+
+    def _screen(self, pending, payloads, args):
+        """Remove the least promising candidates from `pending` using the surrogate model.
+
+        Screening is enabled by passing `surrogate_fraction`, the fraction of the new candidates to
+        simulate, to `evolve`. Candidates are ranked by the number of other candidates whose
+        predicted objectives dominate their optimistic objectives (the prediction improved by
+        `surrogate_kappa` standard errors, default 1), then by the uncertainty of the prediction.
+        Screening starts once `surrogate_min_samples` candidates have been simulated (default 20).
+        The candidates not simulated are given no fitness, so inspyred excludes them. The bin of each
+        member is hashed in to `surrogate_hash_size` features (default 64; see `surrogate_features`).
+        """
+        fraction = args.get('surrogate_fraction')
+        if fraction is None or len(pending) == 0:
+            return
+
+        if self.surrogate is None:
+            nfeatures = len(self._surrogate_features(*payloads[next(iter(pending.values()))[0]], args=args))
+            self.surrogate = SurrogateModel(nfeatures, len(self._objectives), alpha=args.get('surrogate_alpha', 1.0))
+            self.surrogate_stats = {'screened': 0, 'avoided': 0}
+
+        if self.surrogate.size < args.get('surrogate_min_samples', 20):
+            return
+
+        keys = list(pending.keys())
+        features = np.array([self._surrogate_features(*payloads[pending[key][0]], args=args) for key in keys])
+        with timing.stats.timer('surrogate'):
+            mean, std = self.surrogate.predict(features)
+
+        kappa = args.get('surrogate_kappa', 1.0)
+        if args['_ec'].maximize:
+            optimistic = mean + kappa * std
+            dominated = np.array([np.sum(np.all(mean >= o, axis=1) & np.any(mean > o, axis=1)) for o in optimistic])
+        else:
+            optimistic = mean - kappa * std
+            dominated = np.array([np.sum(np.all(mean <= o, axis=1) & np.any(mean < o, axis=1)) for o in optimistic])
+
+        nselected = max(1, int(np.ceil(fraction * len(keys))))
+        # lexsort sorts by the last key first
+        order = np.lexsort((-np.sum(std, axis=1), dominated))
+        for i in order[nselected:]:
+            del pending[keys[i]]
+
+        self.surrogate_stats['screened'] += len(keys)
+        self.surrogate_stats['avoided'] += len(keys) - nselected
+
+    def _get_racing(self, args):
+        """Return the racing configuration for the current generation, or None if not racing.
+
+        Racing is enabled by passing `racing_fractions`, the increasing fractions of the binned
+        scenario's members to simulate before the full evaluation, to `evolve`. The members of each
+        stage are sampled from every bin in proportion to its size, in an order fixed by
+        `racing_seed`. Candidates are compared with the current archive using confidence bounds of
+        `racing_z` standard errors (default 2).
+        """
+        fractions = args.get('racing_fractions')
+        if not fractions:
+            return None
+
+        ea = args['_ec']
+        archive = [p.fitness.values for p in ea.archive if p.fitness is not None]
+        if len(archive) == 0:
+            # Nothing to compare with; simulate in full
+            return None
+
+        if self.racing_stats is None:
+            self.racing_stats = {'candidates': 0, 'dropped': 0, 'combinations_simulated': 0,
+                                 'combinations_saved': 0}
+
+        nmembers = self._binned_scenario_parameter.scenario.size
+        rank = np.empty(nmembers, dtype=np.int64)
+        rank[np.random.RandomState(args.get('racing_seed', 0)).permutation(nmembers)] = np.arange(nmembers)
+
+        return {
+            'fractions': list(fractions),
+            'rank': rank,
+            'archive': np.array(archive, dtype=np.float64),
+            'maximize': ea.maximize,
+            'z': args.get('racing_z', 2.0),
+        }
+
+    def _get_pareto_archive(self, args):
+        """Return the archive of non-dominated solutions, or None if it is disabled.
+
+        The archive is enabled by passing `pareto_archive=True` or `pareto_archive_filename` to
+        `evolve`. Its size is bounded by `pareto_epsilon` and `pareto_archive_size` (see
+        `ParetoArchive`). It is written to `pareto_archive_filename` at the end of every generation.
+        """
+        if not args.get('pareto_archive', False) and args.get('pareto_archive_filename') is None:
+            return None
+
+        if self.pareto_archive is None:
+            self.pareto_archive = ParetoArchive(len(self._objectives), maximize=args['_ec'].maximize,
+                                                epsilon=args.get('pareto_epsilon'),
+                                                maxsize=args.get('pareto_archive_size'))
+        return self.pareto_archive
+
+    def _get_pool(self, args):
+        """Return the process pool used for parallel evaluation, or None if evaluating serially.
+
+        Parallel evaluation is enabled by passing `num_processes` greater than one and `model_data`
+        (anything accepted by `load`) to `evolve`. Each worker loads its own copy of the model.
+        The workers are shutdown by `close_pool`, which is called when leaving the model's context
+        (`with model: ea.evolve(...)`) and at the end of `resume`.
+        """
+        num_processes = args.get('num_processes', 1)
+        if num_processes is None or num_processes <= 1:
+            return None
+
+        if self._pool is None:
+            try:
+                model_data = args['model_data']
+            except KeyError:
+                raise ValueError('"model_data" must be given to evaluate candidates in parallel.')
+            self._pool = multiprocessing.Pool(num_processes, initializer=_initialise_worker,
+                                              initargs=(self.__class__, model_data, timing.stats.enabled,
+                                                        self._meta_recorder_config()))
+        return self._pool
+
+    def close_pool(self):
+        """Shutdown the worker processes used for parallel evaluation."""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close_pool()
+
+    def _get_fitness_cache(self, args):
+        """Return the fitness cache, or None if caching is disabled.
+
+        Caching is enabled by passing `fitness_cache_size` greater than zero to `evolve`.
+        """
+        maxsize = args.get('fitness_cache_size', 0)
+        if maxsize is None or maxsize <= 0:
+            return None
+
+        if self.fitness_cache is None:
+            self.fitness_cache = FitnessCache(maxsize)
+        return self.fitness_cache
+
+    def evaluator(self, candidates, args):
+        payloads = [(c.get_bin_indices_array(), c.get_bin_variables()) for c in candidates]
+        cache = self._get_fitness_cache(args)
+
+        fitness = [None] * len(candidates)
+        # Candidates to simulate; identical candidates in this batch are only simulated once.
+        pending = OrderedDict()
+        for i, (indices, bin_variables) in enumerate(payloads):
+            if cache is None:
+                pending[i] = [i]
+                continue
+
+            key = candidate_key(indices, bin_variables)
+            if key in pending:
+                pending[key].append(i)
+                cache.hits += 1
+                continue
+
+            fit = cache.get(key)
+            if fit is None:
+                pending[key] = [i]
+            else:
+                fitness[i] = fit
+
+        self._screen(pending, payloads, args)
+
+        racing = self._get_racing(args)
+        to_evaluate = []
+        for positions in pending.values():
+            indices, bin_variables = payloads[positions[0]]
+            if racing is None:
+                to_evaluate.append((indices, bin_variables, None))
+            else:
+                to_evaluate.append((indices, bin_variables, {
+                    'stages': _racing_stages(indices, racing['rank'], racing['fractions']),
+                    'archive': racing['archive'], 'maximize': racing['maximize'], 'z': racing['z']
+                }))
+
+        pool = self._get_pool(args)
+        if pool is None:
+            tasks = [self._evaluate_task(*task) for task in to_evaluate]
+        else:
+            # Pool.map returns the results in the same order as the candidates.
+            tasks = []
+            for task, timings in pool.map(_evaluate_in_worker, to_evaluate, chunksize=1):
+                tasks.append(task)
+                if timings is not None:
+                    timing.stats.merge(timings)
+
+        pareto_archive = self._get_pareto_archive(args)
+        ncombinations = len(self.scenarios.combinations)
+        for (key, positions), (result, simulated) in zip(pending.items(), tasks):
+            if racing is not None:
+                self.racing_stats['candidates'] += 1
+                self.racing_stats['combinations_simulated'] += simulated
+                self.racing_stats['combinations_saved'] += ncombinations - simulated
+            if result is None:
+                # Dropped by racing; inspyred excludes candidates without a fitness
+                self.racing_stats['dropped'] += 1
+                continue
+
+            objectives, meta = result
+            fit = inspyred.ec.emo.Pareto(objectives)
+            fit.meta = meta
+            if cache is not None:
+                cache.put(key, fit)
+            for i in positions:
+                fitness[i] = fit
+            if pareto_archive is not None:
+                if cache is None:
+                    key = candidate_key(*payloads[positions[0]])
+                with timing.stats.timer('pareto_archive'):
+                    pareto_archive.add(key, objectives, meta)
+            if self.surrogate is not None:
+                self.surrogate.add(self._surrogate_features(*payloads[positions[0]], args=args), objectives)
+
+        if self.surrogate is not None:
+            with timing.stats.timer('surrogate'):
+                self.surrogate.fit()
 
         return fitness
 
     def bounder(self, candidate, args):
+        if isinstance(candidate, ArrayMultiBinCandidate):
+            np.clip(candidate.bin_variables, self._binned_lower_bounds, self._binned_upper_bounds,
+                    out=candidate.bin_variables)
+            return candidate
+
         for ivar, var in enumerate(self._binned_variables):
             j = slice(self._binned_variable_map[ivar], self._binned_variable_map[ivar + 1])
             for ibin, bin in enumerate(candidate.bins):
@@ -224,31 +931,439 @@ class InspyredBinnedOptimisationModel(InspyredOptimisationModel):
 
     def observer(self, population, num_generations, num_evaluations, args):
         print(num_generations, num_evaluations, )
-        import json
-
-        class NumpyEncoder(json.JSONEncoder):
-            def default(self, obj):
-                if isinstance(obj, np.integer):
-                    return int(obj)
-                elif isinstance(obj, np.floating):
-                    return float(obj)
-                elif isinstance(obj, np.ndarray):
-                    return obj.tolist()
-                else:
-                    return super(NumpyEncoder, self).default(obj)
 
         archive_filename = args.get('archive_filename')
-        with open(archive_filename, mode='w') as fh:
-            json.dump([p.fitness.meta for p in population], fh, sort_keys=True, indent=4, separators=(',', ': '),
-                      cls=NumpyEncoder)
+        archive_mode = args.get('archive_mode', 'json')
+        with timing.stats.timer('archive'):
+            if archive_mode == 'json':
+                with open(archive_filename, mode='w') as fh:
+                    json.dump([p.fitness.meta for p in population], fh, sort_keys=True, indent=4,
+                              separators=(',', ': '), cls=NumpyEncoder)
+            elif archive_mode == 'stream':
+                self._append_archive(archive_filename, population, num_generations, num_evaluations)
+            else:
+                raise ValueError('Archive mode "{}" not recognised.'.format(archive_mode))
+
+        pareto_archive_filename = args.get('pareto_archive_filename')
+        if pareto_archive_filename is not None and self.pareto_archive is not None:
+            with timing.stats.timer('pareto_archive'):
+                self.pareto_archive.save(pareto_archive_filename)
+
+        metrics_filename = args.get('metrics_filename')
+        if metrics_filename is not None:
+            self._append_metrics(metrics_filename, num_generations, num_evaluations)
+
+        checkpoint_filename = args.get('checkpoint_filename')
+        if checkpoint_filename is not None and num_generations % args.get('checkpoint_interval', 1) == 0:
+            with timing.stats.timer('checkpoint'):
+                self.save_checkpoint(checkpoint_filename, args['_ec'])
+
+    def save_checkpoint(self, filename, ea):
+        """Save the state of an evolutionary computation at the end of a generation.
+
+        The checkpoint contains the population (candidates and fitness), archive, Pareto archive,
+        generation and evaluation counters and random number generator state. It is saved automatically every
+        `checkpoint_interval` generations if `checkpoint_filename` is passed to `evolve`.
+        """
+        state = {
+            'generation': ea.num_generations,
+            'evaluations': ea.num_evaluations,
+            'population': ea.population,
+            'archive': ea.archive,
+            'random_state': ea._random.getstate(),
+            'archived_keys': self._archived_keys,
+            'fitness_cache': self.fitness_cache,
+            'surrogate': self.surrogate,
+            'surrogate_stats': self.surrogate_stats,
+            'racing_stats': self.racing_stats,
+            'pareto_archive': self.pareto_archive,
+        }
+        # Write to a temporary file first so that a crash never leaves a partial checkpoint
+        tmp_filename = '{}.tmp'.format(filename)
+        with open(tmp_filename, mode='wb') as fh:
+            pickle.dump(state, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_filename, filename)
+
+    def resume(self, ea, filename, **kwargs):
+        """Continue an evolutionary computation from a checkpoint.
+
+        `kwargs` must be the arguments originally passed to `ea.evolve` (generator, evaluator,
+        pop_size, etc.). The checkpointed population is passed as the seeds of `ea.evolve` with
+        its saved fitness instead of being evaluated again. The rest of the state is restored before
+        the first generation, so the run continues as if it had not been interrupted.
+        """
+        with open(filename, mode='rb') as fh:
+            state = pickle.load(fh)
+
+        evaluator = kwargs.pop('evaluator', self.evaluator)
+        observer = ea.observer
+        if isinstance(observer, (list, tuple)):
+            observers = observer
+        else:
+            observers = [observer]
+        restored = []
+
+        # inspyred keeps its own references to these for the whole run, so they restore the state on
+        # their first call and then pass on to the original evaluator and observers.
+        def resume_evaluator(candidates, args):
+            if restored:
+                return evaluator(candidates=candidates, args=args)
+            # The initial population is the checkpointed population
+            return [p.fitness for p in state['population']]
+
+        def resume_observer(population, num_generations, num_evaluations, args):
+            if restored:
+                for obs in observers:
+                    obs(population=population, num_generations=num_generations, num_evaluations=num_evaluations,
+                        args=args)
+                return
+            ea.population = state['population']
+            ea.archive = state['archive']
+            ea.num_generations = state['generation']
+            ea.num_evaluations = state['evaluations']
+            ea._random.setstate(state['random_state'])
+            self._archived_keys = state['archived_keys']
+            self.fitness_cache = state['fitness_cache']
+            self.surrogate = state['surrogate']
+            self.surrogate_stats = state['surrogate_stats']
+            self.racing_stats = state.get('racing_stats')
+            self.pareto_archive = state.get('pareto_archive')
+            restored.append(True)
+
+        kwargs.setdefault('checkpoint_filename', filename)
+        kwargs['seeds'] = [p.candidate for p in state['population']]
+        ea.observer = resume_observer
+        try:
+            return ea.evolve(evaluator=resume_evaluator, **kwargs)
+        finally:
+            ea.observer = observer
+            self.close_pool()
+
+    def _append_metrics(self, filename, num_generations, num_evaluations):
+        """Append a line of the accumulated timings and cache statistics to a metrics file."""
+        record = {
+            'generation': num_generations,
+            'evaluations': num_evaluations,
+            'timings': timing.stats.as_dict(),
+        }
+        if self.fitness_cache is not None:
+            record['fitness_cache'] = {'hits': self.fitness_cache.hits, 'misses': self.fitness_cache.misses}
+        if self.racing_stats is not None:
+            record['racing'] = dict(self.racing_stats)
+        if self.surrogate_stats is not None:
+            record['surrogate'] = dict(self.surrogate_stats)
+        if self.pareto_archive is not None:
+            record['pareto_archive'] = {'size': len(self.pareto_archive)}
+
+        with open(filename, mode='w' if num_generations == 0 else 'a') as fh:
+            fh.write(json.dumps(record, sort_keys=True))
+            fh.write('\n')
+
+    def _append_archive(self, filename, population, num_generations, num_evaluations):
+        """Append a single line record of the population to a streaming archive.
+
+        Each record lists the keys of the population and the metadata of only those individuals
+        that were not in the previous generation. Use `read_archive` to rebuild the population of any
+        generation. Only the keys of the last population are remembered, so memory does not grow
+        with the length of the run; an individual that returns after leaving the population is
+        written again.
+        """
+        if num_generations == 0:
+            # Start of a new run; truncate any existing archive.
+            mode = 'w'
+            self._archived_keys = set()
+        else:
+            mode = 'a'
+
+        keys = []
+        individuals = {}
+        for p in population:
+            c = p.candidate
+            key = candidate_key(c.get_bin_indices_array(), c.get_bin_variables())
+            keys.append(key)
+            if key not in self._archived_keys:
+                individuals[key] = p.fitness.meta
+        self._archived_keys = set(keys)
+
+        record = {
+            'generation': num_generations,
+            'evaluations': num_evaluations,
+            'population': keys,
+            'individuals': individuals,
+        }
+
+        with open(filename, mode=mode) as fh:
+            fh.write(json.dumps(record, separators=(',', ':'), cls=NumpyEncoder))
+            fh.write('\n')
+
+
+class NumpyEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, np.integer):
+            return int(obj)
+        elif isinstance(obj, np.floating):
+            return float(obj)
+        elif isinstance(obj, np.ndarray):
+            return obj.tolist()
+        elif isinstance(obj, RecorderValues):
+            return obj.to_dict()
+        else:
+            return super(NumpyEncoder, self).default(obj)
+
+
+def read_archive(filename, generation=None):
+    """Rebuild the population metadata from a streaming archive.
+
+    Returns a list of the metadata of each individual in the population at the given generation.
+    If `generation` is None the population of the last generation in the archive is returned.
+    """
+    individuals = {}
+    population = None
+    with open(filename) as fh:
+        for line in fh:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            individuals.update(record['individuals'])
+            population = record['population']
+            if generation is not None and record['generation'] == generation:
+                break
+        else:
+            if generation is not None:
+                raise KeyError('Generation {} not found in archive.'.format(generation))
+
+    if population is None:
+        raise ValueError('Archive "{}" is empty.'.format(filename))
+    return [individuals[key] for key in population]
+
+
+# Model loaded by each worker process when evaluating in parallel.
+_worker_model = None
+
+
+def _initialise_worker(model_class, model_data, timing_enabled, meta_recorder_config):
+    global _worker_model
+    timing.stats.enabled = timing_enabled
+    _worker_model = model_class.load(model_data)
+    # Use the same meta recorder as the main process so the metadata does not depend on the pool
+    recorder_class, names = meta_recorder_config
+    recorders = None if names is None else [_worker_model.recorders[name] for name in names]
+    _worker_model.meta_recorder = recorder_class(_worker_model, recorders=recorders)
+    _worker_model.setup()
+
+
+def _evaluate_in_worker(payload):
+    result = _worker_model._evaluate_task(*payload)
+    # Return the worker's timings so they are accumulated in the main process.
+    timings = timing.stats.drain() if timing.stats.enabled else None
+    return result, timings
+
+
+def _racing_stages(indices, rank, fractions):
+    """Return the members simulated at each racing stage.
+
+    Each stage takes the given fraction (at least one) of the members of every bin in the order of
+    `rank`, so the stages are stratified by bin and each contains the members of the last.
+    """
+    indices = np.asarray(indices)
+    order = np.argsort(rank)
+    stages = []
+    for fraction in fractions:
+        members = []
+        for ibin in np.unique(indices):
+            bin_members = order[indices[order] == ibin]
+            n = max(1, int(np.ceil(fraction * len(bin_members))))
+            members.extend(bin_members[:n].tolist())
+        stages.append(sorted(members))
+    return stages
+
+
+def _is_dominated(objectives, half_widths, archive, maximize):
+    """Return True if any row of archive dominates the optimistic bounds of the objectives."""
+    if maximize:
+        bound = objectives + half_widths
+        better_or_equal = archive >= bound
+        better = archive > bound
+    else:
+        bound = objectives - half_widths
+        better_or_equal = archive <= bound
+        better = archive < bound
+    return bool(np.any(np.all(better_or_equal, axis=1) & np.any(better, axis=1)))
 
 
 def null_bounder(candidate, args):
     return candidate
 
 
+def _numpy_random(random):
+    """Return a NumPy random state seeded from inspyred's random number generator."""
+    return np.random.RandomState(random.getrandbits(32))
+
+
+def _array_gaussian_mutation(random, candidate, args):
+    mutation_rate = args.setdefault('mutation_rate', 0.1)
+    mean = args.setdefault('gaussian_mean', 0.0)
+    stdev = args.setdefault('gaussian_stdev', 1.0)
+    rng = _numpy_random(random)
+
+    new = candidate.copy()
+    mask = rng.random_sample(new.bin_variables.shape) < mutation_rate
+    new.bin_variables[mask] += rng.normal(mean, stdev, size=np.count_nonzero(mask))
+    return args['_ec'].bounder(new, args)
+
+
+def _array_blend_crossover(random, mom, dad, args):
+    blx_alpha = args.setdefault('blx_alpha', 0.1)
+    blx_points = args.setdefault('blx_points', None)
+    crossover_rate = args.setdefault('crossover_rate', 1.0)
+    rng = _numpy_random(random)
+
+    bro = mom.copy()
+    sis = dad.copy()
+    if blx_points is None:
+        blx_points = slice(None)
+
+    # Each bin is crossed over independently with probability crossover_rate
+    crossed = rng.random_sample(mom.number_of_bins) < crossover_rate
+    # Variables not in blx_points are swapped for bins that are crossed over
+    bro.bin_variables[crossed, :] = dad.bin_variables[crossed, :]
+    sis.bin_variables[crossed, :] = mom.bin_variables[crossed, :]
+
+    a = mom.bin_variables[crossed, :][:, blx_points]
+    b = dad.bin_variables[crossed, :][:, blx_points]
+    smallest, largest = np.minimum(a, b), np.maximum(a, b)
+    delta = blx_alpha * (largest - smallest)
+    for child in (bro, sis):
+        v = child.bin_variables[crossed, :]
+        v[:, blx_points] = smallest - delta + rng.random_sample(a.shape) * (largest - smallest + 2 * delta)
+        child.bin_variables[crossed, :] = v
+
+    bounder = args['_ec'].bounder
+    return [bounder(bro, args), bounder(sis, args)]
+
+
+def _array_bin_crossover(random, mom, dad, cut_points):
+    rng = _numpy_random(random)
+    crossed = np.zeros(mom.number_of_bins, dtype=bool)
+    crossed[cut_points] = True
+
+    children = []
+    for base, donor in ((dad, mom), (mom, dad)):
+        child = base.copy()
+        # Members in the crossed bins of the donor move to those bins.
+        from_donor = crossed[donor.bin_indices]
+        # Members that were in the crossed bins of the base, but are not in the donor's, are unassigned.
+        missing = crossed[base.bin_indices] & ~from_donor
+        child.bin_indices[from_donor] = donor.bin_indices[from_donor]
+        child.bin_indices[missing] = rng.randint(0, child.number_of_bins, size=np.count_nonzero(missing))
+        child.bin_variables[crossed, :] = donor.bin_variables[crossed, :]
+        children.append(child)
+    return children
+
+
+def _array_bin_mutation(random, candidate, p, q):
+    p_members = candidate.get_bin_members(p)
+    q_members = candidate.get_bin_members(q)
+    if len(p_members) == 0 and len(q_members) == 0:
+        return candidate
+
+    new = candidate.copy()
+    # Swap p and q on new copy
+    if len(p_members) > 0:
+        new.bin_indices[random.choice(p_members)] = q
+    if len(q_members) > 0:
+        new.bin_indices[random.choice(q_members)] = p
+    return new
+
+
+def _clip_population(variables, candidates, args):
+    """Clip stacked variables of shape (candidates, bins, variables) to the candidates' bounds.
+
+    Returns the new candidates.
+    """
+    lower, upper = candidates[0].lower_bounds, candidates[0].upper_bounds
+    if lower is not None and upper is not None:
+        # Bounds broadcast across the first axis of the stacked variables
+        np.clip(variables, lower, upper, out=variables)
+        bounder = null_bounder
+    else:
+        bounder = args['_ec'].bounder
+
+    children = []
+    for c, v in zip(candidates, variables):
+        children.append(bounder(ArrayMultiBinCandidate(c.bin_indices, v, lower_bounds=c.lower_bounds,
+                                                       upper_bounds=c.upper_bounds), args))
+    return children
+
+
+def population_gaussian_mutation(random, candidates, args):
+    """Gaussian mutation of the binned variables of a population of `ArrayMultiBinCandidate`.
+
+    This is equivalent to `binned_variable_gaussian_mutation` but mutates all the candidates in a
+    single vectorised operation.
+    """
+    if len(candidates) == 0:
+        return []
+    mutation_rate = args.setdefault('mutation_rate', 0.1)
+    mean = args.setdefault('gaussian_mean', 0.0)
+    stdev = args.setdefault('gaussian_stdev', 1.0)
+    rng = _numpy_random(random)
+
+    variables = np.stack([c.bin_variables for c in candidates])
+    mask = rng.random_sample(variables.shape) < mutation_rate
+    variables[mask] += rng.normal(mean, stdev, size=np.count_nonzero(mask))
+    return _clip_population(variables, candidates, args)
+
+
+def population_blend_crossover(random, candidates, args):
+    """Blend crossover of the binned variables of a population of `ArrayMultiBinCandidate`.
+
+    This is equivalent to `binned_variable_blend_crossover` but crosses over all consecutive pairs
+    of candidates in a single vectorised operation. As with inspyred's crossovers the last
+    candidate of an odd sized population is dropped.
+    """
+    blx_alpha = args.setdefault('blx_alpha', 0.1)
+    blx_points = args.setdefault('blx_points', None)
+    crossover_rate = args.setdefault('crossover_rate', 1.0)
+    if blx_points is None:
+        blx_points = slice(None)
+
+    moms = candidates[0:len(candidates) - 1:2]
+    dads = candidates[1::2]
+    if len(moms) == 0:
+        return []
+    rng = _numpy_random(random)
+
+    mom = np.stack([c.bin_variables for c in moms])
+    dad = np.stack([c.bin_variables for c in dads])
+
+    # Each bin of each pair is crossed over independently with probability crossover_rate
+    crossed = (rng.random_sample(mom.shape[:2]) < crossover_rate)[..., np.newaxis]
+    # Variables not in blx_points are swapped for bins that are crossed over
+    bro = np.where(crossed, dad, mom)
+    sis = np.where(crossed, mom, dad)
+
+    a = mom[..., blx_points]
+    b = dad[..., blx_points]
+    smallest, largest = np.minimum(a, b), np.maximum(a, b)
+    delta = blx_alpha * (largest - smallest)
+    for child in (bro, sis):
+        blended = smallest - delta + rng.random_sample(a.shape) * (largest - smallest + 2 * delta)
+        child[..., blx_points] = np.where(crossed, blended, child[..., blx_points])
+
+    # Interleave the children to match the order of the parents
+    variables = np.empty((2 * len(moms), ) + mom.shape[1:])
+    variables[0::2] = bro
+    variables[1::2] = sis
+    parents = [c for pair in zip(moms, dads) for c in pair]
+    return _clip_population(variables, parents, args)
+
+
 @inspyred.ec.variators.mutator
 def binned_variable_gaussian_mutation(random, candidate, args):
+    if isinstance(candidate, ArrayMultiBinCandidate):
+        return _array_gaussian_mutation(random, candidate, args)
+
     new = copy.deepcopy(candidate)
 
     bounder = args['_ec'].bounder
@@ -266,6 +1381,9 @@ def binned_variable_gaussian_mutation(random, candidate, args):
 
 @inspyred.ec.variators.crossover
 def binned_variable_blend_crossover(random, mom, dad, args):
+    if isinstance(mom, ArrayMultiBinCandidate):
+        return _array_blend_crossover(random, mom, dad, args)
+
     bro = copy.deepcopy(mom)
     sis = copy.deepcopy(dad)
 
@@ -297,6 +1415,9 @@ def bin_crossover(random, mom, dad, args):
         cut_points = random.sample(range(1, nbins), num_cuts)
         cut_points.sort()
 
+        if isinstance(mom, ArrayMultiBinCandidate):
+            return _array_bin_crossover(random, mom, dad, cut_points)
+
         bro = copy.deepcopy(dad)
         sis = copy.deepcopy(mom)
 
@@ -343,12 +1464,16 @@ def bin_mutation(random, candidate, args):
         if p == q:
             return candidate
 
+        if isinstance(candidate, ArrayMultiBinCandidate):
+            return _array_bin_mutation(random, candidate, p, q)
+
         try:
-            p_member = random.choice(list(candidate.bins[p].members))
+            # Sort the members so the choice does not depend on the order of the set
+            p_member = random.choice(sorted(candidate.bins[p].members))
         except IndexError:
             p_member = None
         try:
-            q_member = random.choice(list(candidate.bins[q].members))
+            q_member = random.choice(sorted(candidate.bins[q].members))
         except IndexError:
             q_member = None
 
@@ -1,2 +1,4 @@
-from ._parameters import ConstantScaledParameter
+from ._parameters import ConstantScaledParameter, MultiZoneDemandParameter, MultiZoneDemandZoneParameter
 
+MultiZoneDemandParameter.register()
+MultiZoneDemandZoneParameter.register()
@@ -1,5 +1,10 @@
+from collections.abc import Mapping
+import json
+import numpy as np
 from pywr.recorders import Recorder, ParameterRecorder
-from ._recorders import ConstantParameterScaledRecorder, BinnedRecorder
+from ._recorders import ConstantParameterScaledRecorder, ConstantParametersScaledRecorder, BinnedRecorder
+
+BinnedRecorder.register()
 
 
 class MetaRecorder(Recorder):
@@ -7,10 +12,7 @@ class MetaRecorder(Recorder):
         super(MetaRecorder, self).__init__(model, **kwargs)
         self.recorders = recorders
 
-    def value(self):
-
-        data = {}
-
+    def _iter_recorders(self):
         recorders = self.recorders
         if recorders is None:
             recorders = self.model.recorders
@@ -19,6 +21,13 @@ class MetaRecorder(Recorder):
             if isinstance(r, MetaRecorder):
                 # Avoid recursion
                 continue
+            yield r
+
+    def value(self):
+
+        data = {}
+
+        for r in self._iter_recorders():
 
             rdata = {
                 'class': r.__class__.__name__,
@@ -50,3 +59,105 @@ class JsonMetaRecorder(MetaRecorder):
         return json.dumps(super(JsonMetaRecorder, self).value(), sort_keys=True,
                           indent=4, separators=(',', ': '))
 
+
+class RecorderValues(Mapping):
+    """The values of a set of recorders stored in a single 2-D array.
+
+    Row i of `array` contains the value of every scenario combination for the recorder described
+    by `index[i]`, a tuple of (name, class, node name or None). `aggregated_values` contains the
+    aggregated value of each recorder. Values that a recorder does not provide are NaN and flagged
+    False in `has_values` and `has_aggregated_values` respectively.
+
+    As a mapping it provides the same nested dict as `MetaRecorder.value`. The dict of each
+    recorder is only created when it is accessed.
+    """
+    def __init__(self, index, array, aggregated_values, has_values, has_aggregated_values):
+        self.index = index
+        self.array = array
+        self.aggregated_values = aggregated_values
+        self.has_values = has_values
+        self.has_aggregated_values = has_aggregated_values
+        self._positions = {name: i for i, (name, _, _) in enumerate(index)}
+
+    def __getitem__(self, name):
+        i = self._positions[name]
+        _, klass, node = self.index[i]
+        rdata = {'class': klass}
+        if self.has_aggregated_values[i]:
+            rdata['value'] = float(self.aggregated_values[i])
+        if node is not None:
+            rdata['node'] = node
+        if self.has_values[i]:
+            rdata['all_values'] = self.array[i, :].tolist()
+        return rdata
+
+    def __iter__(self):
+        return iter(name for name, _, _ in self.index)
+
+    def __len__(self):
+        return len(self.index)
+
+    def to_dict(self):
+        return {name: self[name] for name in self}
+
+    def save(self, file):
+        """Save to a `.npz` file. The arrays are written directly without conversion."""
+        np.savez(file, array=self.array, aggregated_values=self.aggregated_values, has_values=self.has_values,
+                 has_aggregated_values=self.has_aggregated_values, index=np.array(json.dumps(self.index)))
+
+    @classmethod
+    def load(cls, file):
+        with np.load(file) as data:
+            index = [tuple(i) for i in json.loads(str(data['index']))]
+            return cls(index, data['array'], data['aggregated_values'], data['has_values'],
+                       data['has_aggregated_values'])
+
+
+class ColumnarMetaRecorder(MetaRecorder):
+    """A `MetaRecorder` that returns the values of the recorders as `RecorderValues`.
+
+    The values of all the recorders are copied in to a single array rather than a list for each
+    recorder.
+    """
+    def __init__(self, *args, **kwargs):
+        super(ColumnarMetaRecorder, self).__init__(*args, **kwargs)
+        self._index = None
+
+    def reset(self):
+        super(ColumnarMetaRecorder, self).reset()
+        # The recorders may have changed
+        self._index = None
+
+    def value(self):
+        recorders = list(self._iter_recorders())
+
+        if self._index is None:
+            index = []
+            for r in recorders:
+                try:
+                    node = r.node.name
+                except AttributeError:
+                    node = None
+                index.append((r.name, r.__class__.__name__, node))
+            self._index = index
+
+        n = len(self.model.scenarios.combinations)
+        values = np.empty((len(recorders), n))
+        aggregated_values = np.empty(len(recorders))
+        has_values = np.ones(len(recorders), dtype=bool)
+        has_aggregated_values = np.ones(len(recorders), dtype=bool)
+
+        for i, r in enumerate(recorders):
+            try:
+                aggregated_values[i] = r.aggregated_value()
+            except NotImplementedError:
+                aggregated_values[i] = np.nan
+                has_aggregated_values[i] = False
+
+            try:
+                values[i, :] = r.values()
+            except AttributeError:
+                values[i, :] = np.nan
+                has_values[i] = False
+
+        return RecorderValues(self._index, values, aggregated_values, has_values, has_aggregated_values)
@@ -0,0 +1,91 @@
+import time
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+class _Timer:
+    def __init__(self, stats, phase):
+        self.stats = stats
+        self.phase = phase
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.stats.add(self.phase, time.perf_counter() - self._start)
+        return False
+
+
+_null_timer = _NullTimer()
+
+
+class TimingStats:
+    """Accumulated wall time and number of calls of named phases.
+
+    Timing is disabled by default. While disabled `timer` returns a shared context manager that
+    does nothing, so the instrumented code has negligible overhead.
+    """
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.totals = {}
+        self.counts = {}
+
+    def timer(self, phase):
+        """Return a context manager that adds the time spent inside it to phase."""
+        if not self.enabled:
+            return _null_timer
+        return _Timer(self, phase)
+
+    def add(self, phase, seconds, count=1):
+        self.totals[phase] = self.totals.get(phase, 0.0) + seconds
+        self.counts[phase] = self.counts.get(phase, 0) + count
+
+    def total(self, phase):
+        return self.totals.get(phase, 0.0)
+
+    def count(self, phase):
+        return self.counts.get(phase, 0)
+
+    def mean(self, phase):
+        try:
+            return self.totals[phase] / self.counts[phase]
+        except KeyError:
+            return 0.0
+
+    def as_dict(self):
+        return {phase: {'total': self.totals[phase], 'count': self.counts[phase], 'mean': self.mean(phase)}
+                for phase in self.totals}
+
+    def merge(self, data):
+        """Add the timings from the output of `as_dict` (e.g. from another process)."""
+        for phase, d in data.items():
+            self.add(phase, d['total'], count=d['count'])
+
+    def drain(self):
+        """Return the timings as a dict and reset them."""
+        data = self.as_dict()
+        self.reset()
+        return data
+
+    def reset(self):
+        self.totals = {}
+        self.counts = {}
+
+
+# Timings shared by the optimisation models and parameters in this process.
+stats = TimingStats()
+
+
+def enable():
+    stats.enabled = True
+
+
+def disable():
+    stats.enabled = False
@@ -11,11 +11,17 @@ if '--enable-profiling' in sys.argv:
      compiler_directives['profile'] = True
      sys.argv.remove('--enable-profiling')
 
+openmp_args = []
+if '--enable-openmp' in sys.argv:
+     openmp_args.append('-fopenmp')
+     sys.argv.remove('--enable-openmp')
+
 extensions = [
     Extension('pywr_extras._parameters', ['pywr_extras/_parameters.pyx'], include_dirs=[np.get_include()]),
     Extension('pywr_extras._optimisation', ['pywr_extras/_optimisation.pyx'], include_dirs=[np.get_include()]),
     Extension('pywr_extras._recorders', ['pywr_extras/_recorders.pyx'], include_dirs=[np.get_include()]),
-    Extension('pywr_extras._hydrology', ['pywr_extras/_hydrology.pyx'], include_dirs=[np.get_include()]),
+    Extension('pywr_extras._hydrology', ['pywr_extras/_hydrology.pyx'], include_dirs=[np.get_include()],
+              extra_compile_args=openmp_args, extra_link_args=openmp_args),
 ]
 
 setup(
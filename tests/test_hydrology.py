@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+
+hydrology = pytest.importorskip('pywr_extras.hydrology')
+from pycatchmod.utils import catchment_from_json
+from pywr.core import Model, Scenario
+
+DAYS = 365
+
+
+def round_to_single(a):
+    return np.asarray(a, dtype=np.float32).astype(np.float64)
+
+
+def test_compare_flows_within_tolerance():
+    flows = np.random.RandomState(0).uniform(0.0, 100.0, size=(DAYS, 10))
+    result = hydrology.compare_flows(flows, round_to_single(flows))
+    assert result['passed']
+    assert 0.0 < result['max_relative_error'] < 1e-7
+
+
+def test_compare_flows_detects_single_precision_error():
+    # Flows that depend on a small difference of the inputs lose most of their precision in float32.
+    inputs = 1.0 + np.random.RandomState(0).uniform(0.0, 1e-5, size=(DAYS, 10))
+    double = 1e3 * (inputs - 1.0)
+    single = 1e3 * (round_to_single(inputs) - 1.0)
+
+    result = hydrology.compare_flows(double, single)
+    assert not result['passed']
+    assert result['max_relative_error'] > hydrology.SINGLE_PRECISION_RTOL
+
+
+def test_compare_flows_shape():
+    with pytest.raises(ValueError):
+        hydrology.compare_flows(np.zeros((2, 3)), np.zeros((3, 2)))
+
+
+def catchment_data():
+    subcatchments = []
+    for i in range(2):
+        subcatchments.append({
+            'name': 'subcatchment{}'.format(i),
+            'area': 100.0 * (i + 1),
+            'initial_upper_deficit': 0.0,
+            'initial_lower_deficit': 0.0,
+            'initial_linear_outflow': 0.0,
+            'initial_nonlinear_outflow': 0.0,
+            'direct_percolation': 50.0,
+            'potential_drying_constant': 100.0,
+            'gradient_drying_curve': 0.3,
+            'linear_storage_constant': 0.8,
+            'nonlinear_storage_constant': 5.0,
+        })
+    return {'name': 'test', 'subcatchments': subcatchments}
+
+
+@pytest.fixture
+def catchmod_model():
+    model = Model.load({
+        'metadata': {'title': 'Test', 'description': '', 'minimum_version': '0.2dev0'},
+        'timestepper': {'start': '2000-01-01', 'end': '2000-12-30', 'timestep': 1},
+        'nodes': [
+            {'name': 'supply', 'type': 'input', 'max_flow': 10.0},
+            {'name': 'demand', 'type': 'output', 'max_flow': 8.0, 'cost': -10.0},
+        ],
+        'edges': [['supply', 'demand']],
+    })
+    weather_scenario = Scenario(model, 'weather', size=4)
+    cc_scenario = Scenario(model, 'climate change', size=2)
+
+    rs = np.random.RandomState(0)
+    rainfall = rs.gamma(0.6, 4.0, size=(DAYS, 4))
+    pet = np.maximum(2.0 + 0.3 * rs.standard_normal((DAYS, 4)), 0.0)
+    factors = 1.0 + 0.1 * rs.standard_normal((12, 2))
+
+    parameter = hydrology.CatchmodParameter(None, weather_scenario, cc_scenario, rainfall, pet, factors, factors,
+                                            catchmod_factory=lambda n: catchment_from_json(catchment_data(), n=n))
+    model.nodes['supply'].max_flow = parameter
+    model.setup()
+    return model, parameter, rainfall
+
+
+def test_check_single_precision(catchmod_model):
+    model, parameter, rainfall = catchmod_model
+    result = hydrology.check_single_precision(model, parameter)
+
+    assert result['passed']
+    # The single precision run simulated the rounded inputs rather than reading the cached flows
+    assert result['max_absolute_error'] > 0.0
+    # The parameter is restored
+    assert not parameter.single_precision
+    assert not parameter.use_flow_cache
+    assert parameter.inputs[0].source is rainfall
+
+
+def test_check_single_precision_detects_error(catchmod_model):
+    model, parameter, rainfall = catchmod_model
+    result = hydrology.check_single_precision(model, parameter, rtol=0.0, atol=0.0)
+    assert not result['passed']
+
+
+def test_check_single_precision_requires_double_inputs(catchmod_model):
+    model, parameter, rainfall = catchmod_model
+    parameter.single_precision = True
+    with pytest.raises(ValueError):
+        hydrology.check_single_precision(model, parameter)
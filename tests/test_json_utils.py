@@ -0,0 +1,157 @@
+import json
+import pytest
+from pywr_extras import json_utils
+from pywr_extras.json_utils import ModelDocument
+
+
+def empty_data():
+    return {"nodes": [], "edges": [], "parameters": {}, "recorders": {}}
+
+
+def write_includes(tmpdir, includes):
+    filenames = []
+    for i, include_data in enumerate(includes):
+        filename = str(tmpdir.join('include{}.json'.format(i)))
+        with open(filename, 'w') as fh:
+            json.dump(include_data, fh)
+        filenames.append(filename)
+    return filenames
+
+
+def baseline_join(filenames):
+    # The list based merge that join_models used before ModelDocument
+    data = empty_data()
+    for filename in filenames:
+        with open(filename) as fh:
+            include_data = json.load(fh)
+        for node_data in include_data.get("nodes", []):
+            if "placeholder" in node_data:
+                continue
+            json_utils.add_node(data, **node_data)
+        for edge_data in include_data.get("edges", []):
+            json_utils.add_connection(data, *edge_data)
+        data["parameters"].update(include_data.get("parameters", {}))
+        data["recorders"].update(include_data.get("recorders", {}))
+    return data
+
+
+@pytest.mark.parametrize("first, second, duplicate", [
+    (("a", "b"), ("a", "b"), True),
+    (("a", "b"), ("b", "a"), False),
+    # Edges match over their common length
+    (("a", "b"), ("a", "b", 0), True),
+    (("a", "b", 0), ("a", "b"), True),
+    (("a", "b", 0), ("a", "b", 1), False),
+    (("a", "b", 0, 1), ("a", "b", 0), True),
+])
+def test_duplicate_edges_match_baseline(first, second, duplicate):
+    data = empty_data()
+    document = ModelDocument(empty_data())
+    for d in (data, document):
+        json_utils.add_connection(d, *first)
+        if duplicate:
+            with pytest.raises(ValueError):
+                json_utils.add_connection(d, *second)
+        else:
+            json_utils.add_connection(d, *second)
+    assert document.data["edges"] == data["edges"]
+
+
+def test_remove_node():
+    document = ModelDocument(empty_data())
+    document.add_node(name="a", type="input")
+    document.add_node(name="b", type="output")
+
+    document.remove_node("a")
+    assert [n["name"] for n in document["nodes"]] == ["b"]
+    with pytest.raises(KeyError):
+        document.get_node("a")
+    with pytest.raises(ValueError):
+        document.remove_node("a")
+
+    # A placeholder is replaced by the full definition of the node
+    document.add_node(name="c", placeholder=True)
+    document.add_node(name="c", type="link")
+    assert document.get_node("c") == {"name": "c", "type": "link"}
+    assert [n["name"] for n in document["nodes"]] == ["b", "c"]
+
+
+def test_remove_node_function():
+    data = empty_data()
+    json_utils.add_node(data, name="a")
+    json_utils.remove_node(data, "a")
+    assert data["nodes"] == []
+    with pytest.raises(ValueError):
+        json_utils.remove_node(data, "a")
+
+
+def test_join_models_matches_baseline(tmpdir):
+    includes = [
+        {"nodes": [{"name": "a", "type": "input"}, {"name": "b", "type": "link"}],
+         "edges": [["a", "b"]], "parameters": {"p": {"type": "constant", "value": 1}}},
+        {"nodes": [{"name": "b", "max_flow": 2.0}, {"name": "c", "type": "output"}, {"name": "a", "placeholder": True}],
+         "edges": [["b", "c", 0], ["b", "c", 1]], "recorders": {"r": {"type": "numpyarraynoderecorder", "node": "c"}}},
+    ]
+    filenames = write_includes(tmpdir, includes)
+
+    joined = json_utils.join_models(filenames, data=empty_data())
+    expected = baseline_join(filenames)
+    assert joined["nodes"] == expected["nodes"]
+    assert [list(e) for e in joined["edges"]] == [list(e) for e in expected["edges"]]
+    assert joined["parameters"] == expected["parameters"]
+    assert joined["recorders"] == expected["recorders"]
+
+
+def test_join_models_duplicate_edge(tmpdir):
+    includes = [
+        {"nodes": [{"name": "a"}, {"name": "b"}], "edges": [["a", "b"]]},
+        {"edges": [["a", "b", 0]]},
+    ]
+    filenames = write_includes(tmpdir, includes)
+    with pytest.raises(ValueError):
+        baseline_join(filenames)
+    with pytest.raises(ValueError):
+        json_utils.join_models(filenames, data=empty_data())
+
+
+def test_share_tables():
+    data = {"parameters": {
+        "p1": {"type": "constant", "url": "x.csv", "index_col": 0, "column": "a", "index": "z1"},
+        "p2": {"type": "constant", "url": "x.csv", "index_col": 0, "column": "b", "index": "z1"},
+        "p3": {"type": "constant", "url": "x.csv", "index_col": 1, "column": "a", "index": "z1"},
+    }}
+    created = json_utils.share_tables(data)
+
+    assert len(created) == 1
+    name, table = list(created.items())[0]
+    assert table == {"url": "x.csv", "index_col": 0}
+    assert data["tables"][name] == table
+    assert data["parameters"]["p1"] == {"type": "constant", "table": name, "column": "a", "index": "z1"}
+    assert data["parameters"]["p2"] == {"type": "constant", "table": name, "column": "b", "index": "z1"}
+    # Read with different options
+    assert data["parameters"]["p3"]["url"] == "x.csv"
+
+
+def test_share_tables_read_options():
+    # References to different sheets, or read with different options, must not share a table
+    data = {"parameters": {
+        "baseline": {"type": "constant", "url": "x.xlsx", "sheet_name": "Baseline", "column": "a"},
+        "scenario": {"type": "constant", "url": "x.xlsx", "sheet_name": "Scenario2", "column": "a"},
+        "semicolon": {"type": "constant", "url": "y.csv", "sep": ";", "column": "a"},
+        "comma": {"type": "constant", "url": "y.csv", "column": "a"},
+        "latin": {"type": "constant", "url": "z.csv", "encoding": "latin-1", "column": "a"},
+        "utf8": {"type": "constant", "url": "z.csv", "na_values": ["-"], "column": "a"},
+    }}
+    original = json.loads(json.dumps(data))
+    assert json_utils.share_tables(data) == {}
+    assert data["parameters"] == original["parameters"]
+
+
+def test_share_tables_unrecognised_keys():
+    data = {"parameters": {
+        "p1": {"type": "constant", "url": "x.csv", "column": "a", "unknown_option": 1},
+        "p2": {"type": "constant", "url": "x.csv", "column": "b", "unknown_option": 2},
+    }}
+    original = json.loads(json.dumps(data))
+    assert json_utils.share_tables(data) == {}
+    assert data["parameters"] == original["parameters"]
@@ -0,0 +1,217 @@
+import json
+import random
+import numpy as np
+import pytest
+
+pytest.importorskip('pywr')
+inspyred = pytest.importorskip('inspyred')
+from pywr_extras import optimisation
+from pywr_extras.optimisation import InspyredBinnedOptimisationModel, MultiBinCandidate
+
+
+NBINS = 3
+NMEMBERS = 40
+
+
+class ToyModel(InspyredBinnedOptimisationModel):
+    """An optimisation model whose objectives are computed directly from the candidate."""
+    _objectives = [None, None]
+
+    def generator(self, random, args):
+        members = list(range(NMEMBERS))
+        random.shuffle(members)
+        bin_members = [members[i::NBINS] for i in range(NBINS)]
+        bin_variables = [np.array([random.uniform(0, 1)]) for _ in range(NBINS)]
+        return MultiBinCandidate(NBINS, bin_variables=bin_variables, bin_members=bin_members)
+
+    def evaluator(self, candidates, args):
+        fitness = []
+        for c in candidates:
+            indices = c.get_bin_indices_array()
+            variables = np.array(c.get_bin_variables())[:, 0]
+            x = variables[indices]
+            fit = inspyred.ec.emo.Pareto([float(np.sum(x * np.arange(NMEMBERS))), float(np.sum((1 - x)**2))])
+            fit.meta = {'indices': indices.tolist()}
+            fitness.append(fit)
+        return fitness
+
+    def bounder(self, candidate, args):
+        for b in candidate.bins:
+            b.variables = np.clip(b.variables, 0.0, 1.0)
+        return candidate
+
+
+def evolve(tmpdir, generations, checkpoint=None):
+    model = ToyModel()
+    ea = inspyred.ec.emo.NSGA2(random.Random(1))
+    ea.variator = [optimisation.bin_crossover, optimisation.bin_mutation]
+    ea.terminator = inspyred.ec.terminators.generation_termination
+    ea.observer = model.observer
+    kwargs = dict(generator=model.generator, evaluator=model.evaluator, pop_size=8, maximize=False,
+                  bounder=model.bounder, max_generations=generations, mutation_rate=0.5,
+                  archive_filename=str(tmpdir.join('archive.json')),
+                  checkpoint_filename=str(tmpdir.join('checkpoint.pickle')))
+    if checkpoint is None:
+        population = ea.evolve(**kwargs)
+    else:
+        population = model.resume(ea, checkpoint, **kwargs)
+    return sorted(tuple(p.candidate.get_bin_indices_array().tolist()) for p in population), ea.num_evaluations
+
+
+def test_resume_matches_uninterrupted_run(tmpdir):
+    expected = evolve(tmpdir.mkdir("full"), 15)
+
+    interrupted = tmpdir.mkdir('interrupted')
+    evolve(interrupted, 6)
+    resumed = evolve(interrupted, 15, checkpoint=str(interrupted.join('checkpoint.pickle')))
+    assert resumed == expected
+
+
+def test_surrogate_features_distinguish_swaps():
+    rng = np.random.RandomState(0)
+    indices = rng.randint(0, NBINS, size=1000)
+    bin_variables = [np.array([0.5])] * NBINS
+    features = optimisation.surrogate_features(indices, bin_variables, NBINS)
+
+    # Swap the bins of two members, as bin_mutation does; the number in each bin is unchanged
+    i, j = np.flatnonzero(indices == 0)[0], np.flatnonzero(indices == 1)[0]
+    swapped = indices.copy()
+    swapped[i], swapped[j] = indices[j], indices[i]
+    swapped_features = optimisation.surrogate_features(swapped, bin_variables, NBINS)
+
+    assert len(features) == NBINS + 64 + NBINS
+    assert not np.allclose(features, swapped_features)
+    np.testing.assert_array_equal(features, optimisation.surrogate_features(indices, bin_variables, NBINS))
+
+
+def test_candidate_key():
+    indices = np.array([0, 1, 1, 0])
+    bin_variables = [np.array([0.5, 1.0]), np.array([2.0, 3.0])]
+    key = optimisation.candidate_key(indices, bin_variables)
+
+    assert key == optimisation.candidate_key(indices.astype(np.int64), [v.copy() for v in bin_variables])
+    assert key != optimisation.candidate_key(np.array([1, 0, 1, 0]), bin_variables)
+    assert key != optimisation.candidate_key(indices, [np.array([0.5, 1.0]), np.array([2.0, 3.5])])
+
+
+def test_fitness_cache_lru():
+    cache = optimisation.FitnessCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1  # 'a' is now the most recently used
+    cache.put('c', 3)
+
+    assert 'b' not in cache
+    assert 'a' in cache and 'c' in cache
+    assert len(cache) == 2
+    assert cache.get('b') is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    cache.clear()
+    assert len(cache) == 0
+    assert (cache.hits, cache.misses) == (0, 0)
+
+    with pytest.raises(ValueError):
+        optimisation.FitnessCache(maxsize=0)
+
+
+class Individual(object):
+    def __init__(self, indices, value):
+        self.candidate = optimisation.ArrayMultiBinCandidate(np.array(indices, dtype=np.int32),
+                                                              np.array([[value], [value + 1]]))
+        self.fitness = inspyred.ec.emo.Pareto([value])
+        self.fitness.meta = {'value': value}
+
+
+def test_streaming_archive_round_trip(tmpdir):
+    filename = str(tmpdir.join('archive.jsonl'))
+    model = ToyModel()
+    a, b, c = Individual([0, 1], 1.0), Individual([1, 0], 2.0), Individual([1, 1], 3.0)
+    populations = [[a, b], [b, c], [a, c]]
+    for generation, population in enumerate(populations):
+        model._append_archive(filename, population, generation, 2 * (generation + 1))
+
+    for generation, population in enumerate(populations):
+        assert optimisation.read_archive(filename, generation) == [p.fitness.meta for p in population]
+    assert optimisation.read_archive(filename) == [a.fitness.meta, c.fitness.meta]
+    with pytest.raises(KeyError):
+        optimisation.read_archive(filename, 3)
+
+    # Only new individuals are written each generation
+    with open(filename) as fh:
+        records = [json.loads(line) for line in fh]
+    assert [len(r['individuals']) for r in records] == [2, 1, 1]
+
+    # A new run truncates the archive
+    model._append_archive(filename, [c], 0, 1)
+    assert optimisation.read_archive(filename) == [c.fitness.meta]
+
+
+def non_dominated(objectives, maximize):
+    # Brute force filter keeping the first of any equal solutions
+    f = -objectives if maximize else objectives
+    keep = []
+    for i in range(len(f)):
+        dominated = False
+        for j in range(len(f)):
+            if np.all(f[j] <= f[i]) and np.any(f[j] < f[i]):
+                dominated = True
+            elif j < i and np.all(f[j] == f[i]):
+                dominated = True
+        if not dominated:
+            keep.append(i)
+    return keep
+
+
+@pytest.mark.parametrize("number_of_objectives", [2, 3, 4])
+@pytest.mark.parametrize("maximize", [True, False])
+def test_pareto_archive(number_of_objectives, maximize):
+    objectives = np.round(np.random.RandomState(number_of_objectives).rand(300, number_of_objectives), 2)
+    archive = optimisation.ParetoArchive(number_of_objectives, maximize=maximize)
+    for i, f in enumerate(objectives):
+        archive.add(str(i), f, meta={'i': i})
+
+    expected = non_dominated(objectives, maximize)
+    assert sorted(int(key) for key in archive.keys) == expected
+    for key, f, meta in archive:
+        np.testing.assert_array_equal(f, objectives[int(key)])
+        assert meta == {'i': int(key)}
+    # Adding an archived key again does not duplicate it
+    key = archive.keys[0]
+    assert archive.add(key, objectives[int(key)], meta={'i': -1})
+    assert archive.get_meta(key) == {'i': int(key)}
+    assert len(archive) == len(expected)
+
+
+def test_pareto_archive_epsilon():
+    x = np.random.RandomState(0).rand(2000)
+    objectives = np.c_[x, 1.0 - x]
+    archive = optimisation.ParetoArchive(2, maximize=False, epsilon=0.1)
+    for i, f in enumerate(objectives):
+        archive.add(i, f)
+
+    boxes = np.floor(archive.objectives / 0.1)
+    # At most one solution in each box, and none of the boxes dominates another
+    assert len(set(map(tuple, boxes.tolist()))) == len(archive)
+    assert len(non_dominated(boxes, maximize=False)) == len(archive)
+    assert len(archive) <= 11
+
+
+def test_pareto_archive_crowding():
+    x = np.random.RandomState(0).rand(2000)
+    objectives = np.c_[x, 1.0 - x]
+    archive = optimisation.ParetoArchive(2, maximize=False, maxsize=20)
+    for i, f in enumerate(objectives):
+        archive.add(i, f)
+
+    assert len(archive) == 20
+    # The extreme solutions are never removed
+    assert objectives[:, 0].argmin() in archive
+    assert objectives[:, 1].argmin() in archive
+
+
+def test_crowding_distance():
+    objectives = np.array([[0.0, 1.0], [0.1, 0.9], [0.5, 0.5], [1.0, 0.0]])
+    distance = optimisation.crowding_distance(objectives)
+    assert np.isinf(distance[0]) and np.isinf(distance[3])
+    np.testing.assert_allclose(distance[1:3], [1.0, 1.8])
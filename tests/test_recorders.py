@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+recorders = pytest.importorskip('pywr_extras.recorders')
+from pywr.core import Model
+
+
+class Node(object):
+    def __init__(self, name):
+        self.name = name
+
+
+class ArrayRecorder(object):
+    def __init__(self, name, values, node=None):
+        self.name = name
+        self._values = np.asarray(values, dtype=np.float64)
+        if node is not None:
+            self.node = Node(node)
+
+    def values(self):
+        return self._values
+
+    def aggregated_value(self):
+        return float(np.mean(self._values))
+
+
+class UnaggregatedRecorder(ArrayRecorder):
+    def aggregated_value(self):
+        raise NotImplementedError()
+
+
+class ScalarRecorder(object):
+    # A recorder without per scenario values
+    def __init__(self, name, value):
+        self.name = name
+        self.value = value
+
+    def aggregated_value(self):
+        return self.value
+
+
+@pytest.fixture
+def model_recorders():
+    model = Model()
+    n = len(model.scenarios.combinations)
+    rs = [
+        ArrayRecorder('flow', np.arange(n) + 1.5, node='supply'),
+        UnaggregatedRecorder('storage', np.arange(n) * 2.0),
+        ScalarRecorder('cost', 3.25),
+    ]
+    return model, rs
+
+
+def test_recorder_values_mapping(model_recorders):
+    model, rs = model_recorders
+    expected = recorders.MetaRecorder(model, recorders=rs).value()
+    rv = recorders.ColumnarMetaRecorder(model, recorders=rs).value()
+
+    assert dict(rv) == expected
+    assert list(rv.values()) == list(expected.values())
+    assert list(rv.items()) == list(expected.items())
+    assert rv.to_dict() == expected
+
+
+def test_recorder_values_save_load(model_recorders, tmpdir):
+    model, rs = model_recorders
+    rv = recorders.ColumnarMetaRecorder(model, recorders=rs).value()
+    filename = str(tmpdir.join('values.npz'))
+    rv.save(filename)
+
+    loaded = recorders.RecorderValues.load(filename)
+    assert loaded.to_dict() == rv.to_dict()
+    np.testing.assert_array_equal(loaded.array, rv.array)